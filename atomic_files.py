@@ -0,0 +1,58 @@
+"""Crash-safe file replacement, shared by the assignments that persist data"""
+import os
+from contextlib import contextmanager
+
+@contextmanager
+def atomic_write(path: str, backups: int = 0):
+    """Open a temporary file that atomically replaces path when the block succeeds
+    
+    The data is fsynced before the rename, so a crash leaves either the old
+    or the new file, never a truncated one. With backups > 0 the previous
+    versions are kept as path.1 (newest) to path.N, using hard links where
+    the filesystem allows so no data is copied.
+    """
+    import tempfile
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix=f".{os.path.basename(path)}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w") as f:
+            yield f
+            f.flush()
+            os.fsync(f.fileno())
+        if os.path.exists(path):
+            os.chmod(temp_path, os.stat(path).st_mode)
+            if backups:
+                _rotate_backups(path, backups)
+        os.replace(temp_path, path)
+    except BaseException:
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+        raise
+    _fsync_directory(directory)
+
+def _rotate_backups(path: str, backups: int):
+    for generation in range(backups - 1, 0, -1):
+        if os.path.exists(f"{path}.{generation}"):
+            os.replace(f"{path}.{generation}", f"{path}.{generation + 1}")
+    try:
+        if os.path.exists(f"{path}.1"):
+            os.remove(f"{path}.1")
+        os.link(path, f"{path}.1")
+    except OSError:
+        import shutil
+        shutil.copy2(path, f"{path}.1")
+
+def _fsync_directory(directory: str):
+    """Persist the rename itself; not supported on every platform"""
+    try:
+        dir_fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(dir_fd)
+    except OSError:
+        pass
+    finally:
+        os.close(dir_fd)
@@ -0,0 +1,287 @@
+"""Benchmarks and sanity checks for password_manager.py
+
+Usage:
+    python password_benchmark.py [--count 100000] [--length 16] [--max-startup-ms 60]
+                                 [--entries 10 1000 10000] [--kdf scrypt|pbkdf2] [--profile DIR]
+
+Besides password generation and startup, it builds synthetic vaults of each
+size in --entries (10 to 100k) and times initialize (cold and cached key,
+eager and lazy), get_entry, list_services, add_entry and _save_entries.
+Every phase is split into KDF, Fernet, JSON, file I/O and other time by
+wrapping those calls while it runs. With --profile a cProfile dump per
+vault size and phase is written to DIR (open with pstats or snakeviz).
+
+Prints a JSON report and exits with status 1 if a uniformity check fails,
+if importing password_manager takes longer than --max-startup-ms, or if it
+pulls in a module that should only load on first use.
+"""
+import argparse
+import cProfile
+import json
+import math
+import os
+import re
+import sys
+import tempfile
+import time
+import types
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional, Tuple
+import password_manager
+from password_manager import EncryptionManager, PasswordEntry, PasswordGenerator, PasswordManager, PasswordPolicy
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+# import_timing is shared with the other assignments in the repository root
+sys.path.append(os.path.dirname(HERE))
+from import_timing import measure_startup
+
+# Loaded on first use (unlock, rotation, argv parsing), never at import
+DEFERRED_MODULES = ("cryptography", "concurrent.futures", "multiprocessing", "argparse", "shlex")
+
+def benchmark_generation(count: int, length: int) -> Dict:
+    """Passwords per second for generate() in a loop against generate_many()"""
+    generator = PasswordGenerator(length)
+    single_count = max(1, count // 10)
+    
+    start = time.perf_counter()
+    for _ in range(single_count):
+        generator.generate()
+    single_seconds = time.perf_counter() - start
+    
+    start = time.perf_counter()
+    generator.generate_many(count, length)
+    batch_seconds = time.perf_counter() - start
+    
+    return {
+        "length": length,
+        "generate": {"passwords": single_count, "seconds": single_seconds,
+                     "per_second": single_count / single_seconds},
+        "generate_many": {"passwords": count, "seconds": batch_seconds,
+                          "per_second": count / batch_seconds}
+    }
+
+def chi_square_p_value(statistic: float, dof: int) -> float:
+    """Upper tail of the chi-square distribution (Wilson-Hilferty approximation)"""
+    z = ((statistic / dof) ** (1 / 3) - (1 - 2 / (9 * dof))) / math.sqrt(2 / (9 * dof))
+    return 0.5 * math.erfc(z / math.sqrt(2))
+
+def check_uniformity(passwords: List[str]) -> Dict:
+    """Chi-square test that characters are uniform within each character class
+    
+    Required characters are forced per class, so the overall frequencies are
+    not flat, but within a class every character must be equally likely.
+    """
+    counts = Counter(''.join(passwords))
+    results = {}
+    for name, chars in PasswordPolicy.DEFAULT_CLASSES.items():
+        observed = [counts[c] for c in chars]
+        total = sum(observed)
+        expected = total / len(chars)
+        statistic = sum((o - expected) ** 2 / expected for o in observed)
+        dof = len(chars) - 1
+        results[name] = {
+            "samples": total,
+            "chi_square": statistic,
+            "dof": dof,
+            "p_value": chi_square_p_value(statistic, dof)
+        }
+    return results
+
+class Breakdown:
+    """Accumulates wall time per category (kdf, fernet, json, io) for wrapped calls"""
+    def __init__(self):
+        self.seconds: Dict[str, float] = defaultdict(float)
+    
+    def wrap(self, category: str, fn: Callable) -> Callable:
+        seconds = self.seconds
+        
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                seconds[category] += time.perf_counter() - start
+        return timed
+    
+    def report(self, total: float) -> Dict[str, float]:
+        result = {category: self.seconds.get(category, 0.0) for category in ("kdf", "fernet", "json", "io")}
+        result["other"] = max(0.0, total - sum(result.values()))
+        return result
+
+class _TimedFile:
+    """File wrapper that charges reads, writes, flushes and close to the io category"""
+    def __init__(self, f, breakdown: Breakdown):
+        self._f = f
+        self.write = breakdown.wrap("io", f.write)
+        self.readline = breakdown.wrap("io", f.readline)
+        self.flush = breakdown.wrap("io", f.flush)
+        self.close = breakdown.wrap("io", f.close)
+    
+    def __iter__(self):
+        return iter(self.readline, '')
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc_info):
+        self.close()
+    
+    def __getattr__(self, name):
+        return getattr(self._f, name)
+
+@contextmanager
+def instrumented(breakdown: Breakdown):
+    """Route password_manager's KDF, Fernet, JSON and file calls through breakdown timers"""
+    from cryptography.fernet import Fernet
+    module = password_manager
+    timed_os = types.SimpleNamespace(**{name: getattr(os, name) for name in dir(os) if not name.startswith('__')})
+    timed_os.path = os.path
+    for name in ("fsync", "replace", "remove", "link", "open", "close"):
+        setattr(timed_os, name, breakdown.wrap("io", getattr(os, name)))
+    timed_os.fdopen = lambda *args, **kwargs: _TimedFile(breakdown.wrap("io", os.fdopen)(*args, **kwargs), breakdown)
+    timed_json = types.SimpleNamespace(
+        loads=breakdown.wrap("json", json.loads),
+        dumps=breakdown.wrap("json", json.dumps),
+        JSONDecodeError=json.JSONDecodeError
+    )
+    patches = [
+        (module, "pbkdf2_hmac", breakdown.wrap("kdf", module.pbkdf2_hmac)),
+        (module, "scrypt", breakdown.wrap("kdf", module.scrypt)),
+        (module, "json", timed_json),
+        (module, "os", timed_os),
+        (module, "open", lambda *args, **kwargs: _TimedFile(breakdown.wrap("io", open)(*args, **kwargs), breakdown)),
+        (Fernet, "encrypt", breakdown.wrap("fernet", Fernet.encrypt)),
+        (Fernet, "decrypt", breakdown.wrap("fernet", Fernet.decrypt))
+    ]
+    saved = [(target, name, target.__dict__.get(name)) for target, name, _ in patches]
+    for target, name, value in patches:
+        setattr(target, name, value)
+    try:
+        yield breakdown
+    finally:
+        for target, name, value in saved:
+            if value is None:
+                delattr(target, name)
+            else:
+                setattr(target, name, value)
+
+def build_vault(path: str, entries: int, master_password: str, kdf: Dict):
+    """Write a vault of synthetic entries in one save"""
+    manager = PasswordManager(path)
+    manager.kdf = kdf
+    manager._unlock(master_password)
+    generated = PasswordGenerator().generate_many(entries)
+    for i, password in enumerate(generated):
+        service = f"service{i:06d}"
+        manager.entries[manager._entry_id(service)] = PasswordEntry(service, f"user{i}@example.com", password)
+    manager._save_entries()
+
+def vault_phases(path: str, master_password: str, adds: int,
+                 lookups: int) -> List[Tuple[str, Callable[[], object], Callable]]:
+    """(name, setup, timed) triples; timed receives whatever setup returns"""
+    def cold_manager(lazy: bool) -> Callable[[], PasswordManager]:
+        def setup():
+            EncryptionManager.key_cache.clear()
+            return PasswordManager(path, lazy=lazy)
+        return setup
+    
+    def unlocked(lazy: bool) -> Callable[[], PasswordManager]:
+        def setup():
+            manager = PasswordManager(path, lazy=lazy)
+            manager.initialize(master_password)
+            return manager
+        return setup
+    
+    def get_entries(manager: PasswordManager):
+        entries = len(manager._records)
+        step = max(1, entries // lookups)
+        for i in range(0, entries, step):
+            manager.get_entry(f"service{i:06d}").password
+    
+    def add_entries(manager: PasswordManager):
+        for i in range(adds):
+            manager.add_entry(f"added{i:06d}", "bench@example.com", "correct horse battery staple")
+    
+    return [
+        ("initialize[cold]", cold_manager(False), lambda m: m.initialize(master_password)),
+        ("initialize[lazy, cold]", cold_manager(True), lambda m: m.initialize(master_password)),
+        ("initialize[lazy, cached key]", lambda: PasswordManager(path, lazy=True),
+         lambda m: m.initialize(master_password)),
+        ("get_entry[lazy]", unlocked(True), get_entries),
+        ("get_entry", unlocked(False), get_entries),
+        ("list_services[lazy]", unlocked(True), lambda m: m.list_services()),
+        ("add_entry", unlocked(True), add_entries),
+        ("_save_entries", unlocked(True), lambda m: m._save_entries())
+    ]
+
+def benchmark_vault(entries: int, kdf_name: str = "scrypt", adds: int = 20, lookups: int = 100,
+                    profile_dir: Optional[str] = None) -> Dict:
+    """Time the PasswordManager phases on a synthetic vault with a per-phase breakdown"""
+    master_password = "benchmark master password"
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "vault.json")
+        kdf = EncryptionManager.new_kdf(kdf_name)
+        start = time.perf_counter()
+        build_vault(path, entries, master_password, kdf)
+        result = {
+            "entries": entries,
+            "kdf": {k: v for k, v in kdf.items() if k != "salt"},
+            "build_seconds": time.perf_counter() - start,
+            "file_size": os.path.getsize(path),
+            "phases": {}
+        }
+        
+        for name, setup, timed in vault_phases(path, master_password, adds, lookups):
+            state = setup()
+            breakdown = Breakdown()
+            with instrumented(breakdown):
+                start = time.perf_counter()
+                timed(state)
+                total = time.perf_counter() - start
+            result["phases"][name] = {"seconds": total, "breakdown": breakdown.report(total)}
+            
+            if profile_dir:
+                # A separate run so the profiler does not skew the timings above
+                state = setup()
+                profiler = cProfile.Profile()
+                profiler.runcall(timed, state)
+                file_name = re.sub(r"\W+", "-", name).strip("-")
+                profiler.dump_stats(os.path.join(profile_dir, f"vault{entries}-{file_name}.prof"))
+        return result
+
+def main():
+    parser = argparse.ArgumentParser(description="Password manager benchmarks")
+    parser.add_argument("--count", type=int, default=100000, help="passwords per batch")
+    parser.add_argument("--length", type=int, default=16, help="password length")
+    parser.add_argument("--alpha", type=float, default=0.001,
+                        help="significance level for the uniformity test")
+    parser.add_argument("--max-startup-ms", type=float, default=60.0,
+                        help="fail if importing password_manager takes longer")
+    parser.add_argument("--entries", type=int, nargs="*", default=[10, 1000, 10000],
+                        help="synthetic vault sizes (10 to 100000); none skips the vault phases")
+    parser.add_argument("--kdf", choices=("scrypt", "pbkdf2"), default="scrypt")
+    parser.add_argument("--adds", type=int, default=20, help="add_entry calls to time")
+    parser.add_argument("--lookups", type=int, default=100, help="get_entry calls to time")
+    parser.add_argument("--profile", metavar="DIR", help="write cProfile dumps per vault phase to DIR")
+    args = parser.parse_args()
+    
+    report = {"startup": measure_startup("password_manager", DEFERRED_MODULES, HERE)}
+    report["generation"] = benchmark_generation(args.count, args.length)
+    passwords = PasswordGenerator(args.length).generate_many(args.count)
+    report["uniformity"] = check_uniformity(passwords)
+    if args.profile:
+        os.makedirs(args.profile, exist_ok=True)
+    report["vaults"] = {
+        str(entries): benchmark_vault(entries, args.kdf, args.adds, args.lookups, args.profile)
+        for entries in args.entries
+    }
+    
+    print(json.dumps(report, indent=2))
+    startup = report["startup"]
+    if (any(result["p_value"] < args.alpha for result in report["uniformity"].values())
+            or startup["median_ms"] > args.max_startup_ms or startup["deferred_modules_loaded"]):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -1,57 +1,315 @@
 import json
+import math
 import getpass
-from cryptography.fernet import Fernet
 import base64
+import hmac
 import os
-from hashlib import pbkdf2_hmac
+import time
+from hashlib import pbkdf2_hmac, scrypt, sha256
 import secrets
 import string
-from typing import Dict, Optional, List
+import sys
+from collections import OrderedDict
+from typing import Dict, Optional, List, Tuple, Union, TYPE_CHECKING
+
+# atomic_files is shared with the other assignments in the repository root
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from atomic_files import atomic_write
+
+if TYPE_CHECKING:
+    import argparse
+
+class PasswordPolicy:
+    """Rules for generated passwords, compiled once into lookup tables
+    
+    classes maps a class name to its characters (ASCII only) and defaults
+    to lowercase, uppercase, digits and symbols. min_counts gives the
+    minimum number of characters per class (1 for every class by default).
+    Characters in exclude, plus the ambiguous ones when exclude_ambiguous
+    is set, are removed from every class.
+    """
+    DEFAULT_CLASSES = {
+        'lowercase': string.ascii_lowercase,
+        'uppercase': string.ascii_uppercase,
+        'digits': string.digits,
+        'symbols': string.punctuation
+    }
+    AMBIGUOUS = '0Oo1lI|`\'"'
+    
+    def __init__(self, classes: Optional[Dict[str, str]] = None,
+                 min_counts: Optional[Dict[str, int]] = None,
+                 exclude: str = '', exclude_ambiguous: bool = False):
+        excluded = set(exclude) | (set(self.AMBIGUOUS) if exclude_ambiguous else set())
+        self.exclude = ''.join(sorted(excluded))
+        self.classes: Dict[str, str] = {}
+        seen = set()
+        for name, chars in (classes or self.DEFAULT_CLASSES).items():
+            if not chars.isascii():
+                raise ValueError(f"Character class '{name}' must contain only ASCII characters")
+            # Keep the first occurrence so every character belongs to one class
+            kept = ''.join(dict.fromkeys(c for c in chars if c not in excluded and c not in seen))
+            seen.update(kept)
+            self.classes[name] = kept
+        
+        self.min_counts = {name: 1 for name in self.classes}
+        self.min_counts.update(min_counts or {})
+        for name, count in self.min_counts.items():
+            if name not in self.classes:
+                raise ValueError(f"Unknown character class '{name}'")
+            if count and not self.classes[name]:
+                raise ValueError(f"Character class '{name}' is empty after exclusions")
+        
+        self.alphabet = ''.join(self.classes.values())
+        if not self.alphabet:
+            raise ValueError("Password alphabet is empty")
+        self.min_length = sum(self.min_counts.values())
+        
+        # Byte -> class index (255 for characters outside the alphabet), so a
+        # password is classified with one bytes.translate call
+        names = list(self.classes)
+        table = bytearray(b'\xff' * 256)
+        for index, name in enumerate(names):
+            for c in self.classes[name]:
+                table[ord(c)] = index
+        self._class_table = bytes(table)
+        self._required = [(index, self.min_counts[name]) for index, name in enumerate(names)
+                          if self.min_counts[name]]
+        self._variants: Dict[str, 'PasswordPolicy'] = {}
+    
+    @classmethod
+    def from_options(cls, use_symbols: bool = True, minimum: int = 1,
+                     exclude_ambiguous: bool = False) -> 'PasswordPolicy':
+        """Policy over the default classes with the same minimum for each"""
+        classes = dict(cls.DEFAULT_CLASSES)
+        if not use_symbols:
+            del classes['symbols']
+        return cls(classes, {name: minimum for name in classes},
+                   exclude_ambiguous=exclude_ambiguous)
+    
+    def without_class(self, name: str) -> 'PasswordPolicy':
+        """The same policy with one character class removed (memoized)"""
+        if name not in self.classes:
+            return self
+        if name not in self._variants:
+            classes = {k: v for k, v in self.classes.items() if k != name}
+            min_counts = {k: v for k, v in self.min_counts.items() if k != name}
+            self._variants[name] = PasswordPolicy(classes, min_counts, self.exclude)
+        return self._variants[name]
+    
+    def validate(self, password: str) -> bool:
+        """Check alphabet membership and per-class minimums"""
+        if not password.isascii():
+            return False
+        classified = password.encode('ascii').translate(self._class_table)
+        if b'\xff' in classified:
+            return False
+        return all(classified.count(index) >= count for index, count in self._required)
 
 class PasswordGenerator:
     """Handles password generation functionality"""
-    def __init__(self, length: int = 16):
+    _index_tables: Dict[int, Tuple[bytes, bytes]] = {}
+    
+    def __init__(self, length: int = 16, policy: Optional[PasswordPolicy] = None):
         self.length = length
+        self.policy = policy or PasswordPolicy()
     
-    def generate(self, use_symbols: bool = True) -> str:
+    def generate(self, use_symbols: bool = True, policy: Optional[PasswordPolicy] = None) -> str:
         """Generate a strong random password"""
-        chars = string.ascii_letters + string.digits
-        if use_symbols:
-            chars += string.punctuation
+        if policy is None:
+            policy = self.policy if use_symbols else self.policy.without_class('symbols')
+        return self.generate_many(1, policy=policy)[0]
+    
+    @classmethod
+    def _random_indices(cls, size: int, count: int) -> bytes:
+        """Draw count values uniformly from range(size) (size <= 256) using bulk random bytes
         
-        while True:
-            password = ''.join(secrets.choice(chars) for _ in range(self.length))
-            if (any(c.islower() for c in password)
-                    and any(c.isupper() for c in password)
-                    and any(c.isdigit() for c in password)
-                    and (not use_symbols or any(c in string.punctuation for c in password))):
-                return password
+        Bytes at or above the largest multiple of size are rejected, so the
+        modulo mapping stays unbiased. Mapping and rejection both happen
+        inside bytes.translate.
+        """
+        limit = 256 - 256 % size
+        if size not in cls._index_tables:
+            cls._index_tables[size] = (
+                bytes(b % size if b < limit else 0 for b in range(256)),
+                bytes(range(limit, 256))
+            )
+        table, rejected = cls._index_tables[size]
+        chunks, produced = [], 0
+        while produced < count:
+            needed = count - produced
+            chunk = secrets.token_bytes(needed * 256 // limit + 16).translate(table, rejected)[:needed]
+            chunks.append(chunk)
+            produced += len(chunk)
+        return b''.join(chunks)
+    
+    def _random_chars(self, alphabet: str, count: int) -> str:
+        """Draw count characters uniformly from an ASCII alphabet"""
+        table = alphabet.encode('ascii').ljust(256, b'\0')
+        return self._random_indices(len(alphabet), count).translate(table).decode('ascii')
+    
+    def generate_many(self, n: int, length: Optional[int] = None,
+                      policy: Optional[PasswordPolicy] = None) -> List[str]:
+        """Generate n passwords in one pass over bulk randomness
+        
+        Each password starts with the minimum number of characters from
+        every class, followed by characters drawn uniformly from the whole
+        alphabet. The required characters are then swapped to random
+        positions (a partial Fisher-Yates shuffle), so no password is ever
+        retried.
+        """
+        length = length or self.length
+        policy = policy or self.policy
+        if length < policy.min_length:
+            raise ValueError(f"Password length must be at least {policy.min_length}")
+        
+        required = [
+            self._random_chars(chars, n * policy.min_counts[name])
+            for name, chars in policy.classes.items() if policy.min_counts[name]
+        ]
+        required_counts = [policy.min_counts[name] for name in policy.classes if policy.min_counts[name]]
+        required_length = policy.min_length
+        fill_length = length - required_length
+        fill = self._random_chars(policy.alphabet, n * fill_length)
+        swaps = [
+            self._random_indices(length - j, n) if length - j <= 256
+            else [secrets.randbelow(length - j) for _ in range(n)]
+            for j in range(required_length)
+        ]
+        
+        passwords = []
+        for i in range(n):
+            password = []
+            for chars, count in zip(required, required_counts):
+                password.extend(chars[i * count:(i + 1) * count])
+            password.extend(fill[i * fill_length:(i + 1) * fill_length])
+            for j, offsets in enumerate(swaps):
+                k = j + offsets[i]
+                password[j], password[k] = password[k], password[j]
+            passwords.append(''.join(password))
+        return passwords
+
+class KeyCache:
+    """Process-wide cache of derived keys with time-based expiry
+    
+    Entries are looked up by (KDF name and parameters, password digest),
+    where the digest is an HMAC under a random per-process secret, so the cache never
+    holds the master password itself. Keys are kept in bytearrays and
+    overwritten with zeros when they expire or are cleared. Copies made
+    inside the cryptography library cannot be wiped this way.
+    """
+    def __init__(self, ttl: float = 300.0):
+        self.ttl = ttl
+        self._secret = secrets.token_bytes(32)
+        self._entries: Dict[Tuple, Tuple[bytearray, float]] = {}
+    
+    def cache_key(self, master_password: str, kdf: Dict) -> Tuple:
+        digest = hmac.new(self._secret, master_password.encode(), sha256).digest()
+        return (tuple(sorted(kdf.items())), digest)
+    
+    def get(self, cache_key: Tuple) -> Optional[bytes]:
+        self.evict_expired()
+        entry = self._entries.get(cache_key)
+        if entry is None:
+            return None
+        return bytes(entry[0])
+    
+    def put(self, cache_key: Tuple, key: bytes):
+        self.evict_expired()
+        self._discard(cache_key)
+        self._entries[cache_key] = (bytearray(key), time.monotonic() + self.ttl)
+    
+    def evict_expired(self):
+        now = time.monotonic()
+        for cache_key in [k for k, (_, expires) in self._entries.items() if expires <= now]:
+            self._discard(cache_key)
+    
+    def clear(self):
+        for cache_key in list(self._entries):
+            self._discard(cache_key)
+    
+    def _discard(self, cache_key: Tuple):
+        entry = self._entries.pop(cache_key, None)
+        if entry is not None:
+            key = entry[0]
+            key[:] = bytes(len(key))
 
 class EncryptionManager:
-    """Handles encryption and decryption of passwords"""
-    def __init__(self, master_password: str):
-        self.key = self._derive_key(master_password)
+    """Handles encryption and decryption of passwords
+    
+    The key is derived with the KDF described by a parameter dict, e.g.
+    {'name': 'scrypt', 'salt': <base64>, 'n': 32768, 'r': 8, 'p': 1} or
+    {'name': 'pbkdf2', 'salt': <base64>, 'iterations': 600000}. Vaults store
+    this dict in their header; LEGACY_KDF matches vaults written before that.
+    """
+    key_cache = KeyCache()
+    LEGACY_KDF = {'name': 'pbkdf2', 'salt': base64.b64encode(b'salt_').decode(), 'iterations': 100000}
+    DEFAULT_PARAMS = {
+        'pbkdf2': {'iterations': 600000},
+        'scrypt': {'n': 2 ** 15, 'r': 8, 'p': 1}
+    }
+    
+    def __init__(self, master_password: str, salt: bytes = b'salt_', iterations: int = 100000,
+                 kdf: Optional[Dict] = None):
+        if kdf is None:
+            kdf = {'name': 'pbkdf2', 'salt': base64.b64encode(salt).decode(), 'iterations': iterations}
+        self.kdf = kdf
+        cache_key = self.key_cache.cache_key(master_password, kdf)
+        self.key = self.key_cache.get(cache_key)
+        if self.key is None:
+            self.key = self._derive_key(master_password, kdf)
+            self.key_cache.put(cache_key, self.key)
+        # Imported here so the CLI can prompt before loading cryptography
+        from cryptography.fernet import Fernet
+        self._fernet = Fernet(self.key)
+    
+    @classmethod
+    def new_kdf(cls, name: str = 'scrypt', **params) -> Dict:
+        """KDF parameters with a fresh random salt"""
+        if name not in cls.DEFAULT_PARAMS:
+            raise ValueError(f"Unsupported KDF '{name}'")
+        kdf = {'name': name, 'salt': base64.b64encode(secrets.token_bytes(16)).decode()}
+        kdf.update(cls.DEFAULT_PARAMS[name])
+        kdf.update(params)
+        return kdf
     
     @staticmethod
-    def _derive_key(master_password: str, salt: bytes = b'salt_', iterations: int = 100000) -> bytes:
+    def _derive_key(master_password: str, kdf: Dict) -> bytes:
         """Derive encryption key from master password"""
-        kdf = pbkdf2_hmac(
-            'sha256',
-            master_password.encode(),
-            salt,
-            iterations
-        )
-        return base64.urlsafe_b64encode(kdf)
+        salt = base64.b64decode(kdf['salt'])
+        if kdf['name'] == 'pbkdf2':
+            raw = pbkdf2_hmac('sha256', master_password.encode(), salt, kdf['iterations'])
+        elif kdf['name'] == 'scrypt':
+            n, r, p = kdf['n'], kdf['r'], kdf['p']
+            raw = scrypt(master_password.encode(), salt=salt, n=n, r=r, p=p,
+                         maxmem=128 * r * (n + p + 2) + (1 << 20), dklen=32)
+        else:
+            raise ValueError(f"Unsupported KDF '{kdf['name']}'")
+        return base64.urlsafe_b64encode(raw)
+    
+    @classmethod
+    def calibrate(cls, name: str = 'scrypt', target_seconds: float = 0.25) -> Dict:
+        """Pick KDF parameters that take about target_seconds on this machine
+        
+        PBKDF2 cost is linear in the iteration count. scrypt cost is linear
+        in n, which must be a power of two, so n is rounded to the nearest
+        power (capped at 2**20, about 1 GiB with r=8).
+        """
+        probe = cls.new_kdf(name, **({'iterations': 20000} if name == 'pbkdf2' else {'n': 2 ** 12}))
+        start = time.perf_counter()
+        cls._derive_key('calibration', probe)
+        scale = target_seconds / (time.perf_counter() - start)
+        if name == 'pbkdf2':
+            return cls.new_kdf(name, iterations=max(10000, int(round(probe['iterations'] * scale, -3))))
+        exponent = min(20, max(14, round(math.log2(probe['n'] * scale))))
+        return cls.new_kdf(name, n=2 ** exponent)
     
     def encrypt(self, data: str) -> str:
         """Encrypt sensitive data"""
-        fernet = Fernet(self.key)
-        return fernet.encrypt(data.encode()).decode()
+        return self._fernet.encrypt(data.encode()).decode()
     
     def decrypt(self, encrypted_data: str) -> str:
         """Decrypt sensitive data"""
-        fernet = Fernet(self.key)
-        return fernet.decrypt(encrypted_data.encode()).decode()
+        return self._fernet.decrypt(encrypted_data.encode()).decode()
 
 class PasswordEntry:
     """Represents a single password entry"""
@@ -73,55 +331,517 @@ class PasswordEntry:
         """Create entry from dictionary"""
         return cls(data['service'], data['username'], data['password'])
 
+class LazyPasswordEntry(PasswordEntry):
+    """Password entry whose password is decrypted on first access"""
+    def __init__(self, service: str, username: str, entry_id: str, manager: 'PasswordManager'):
+        self.service = service
+        self.username = username
+        self._entry_id = entry_id
+        self._manager = manager
+    
+    @property
+    def password(self) -> str:
+        return self._manager._password_for(self._entry_id)
+
+class SecretCache:
+    """Small LRU of decrypted passwords that empties itself after an idle period
+    
+    A daemon timer clears the cache once nothing has touched it for
+    idle_timeout seconds, so plaintexts do not outlive the idle period
+    while the program waits for input. Python strings cannot be wiped, so
+    clearing only drops the references; the point is to bound how many
+    plaintexts stay reachable, and for how long.
+    """
+    def __init__(self, maxsize: int = 32, idle_timeout: float = 60.0):
+        import threading
+        self.maxsize = maxsize
+        self.idle_timeout = idle_timeout
+        self._items: 'OrderedDict[str, str]' = OrderedDict()
+        self._last_access = time.monotonic()
+        self._lock = threading.Lock()
+        self._timer: Optional['threading.Timer'] = None
+    
+    def _touch(self):
+        now = time.monotonic()
+        if now - self._last_access > self.idle_timeout:
+            self._items.clear()
+        self._last_access = now
+    
+    def _schedule_expiry(self, delay: float):
+        """Start the timer that empties the cache, unless one is already pending"""
+        if self._timer is None:
+            import threading
+            self._timer = threading.Timer(delay, self._expire)
+            self._timer.daemon = True
+            self._timer.start()
+    
+    def _expire(self):
+        with self._lock:
+            self._timer = None
+            idle = time.monotonic() - self._last_access
+            if idle >= self.idle_timeout:
+                self._items.clear()
+            elif self._items:
+                # Touched since the timer started; wait out the rest
+                self._schedule_expiry(self.idle_timeout - idle)
+    
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            self._touch()
+            value = self._items.get(key)
+            if value is not None:
+                self._items.move_to_end(key)
+            return value
+    
+    def put(self, key: str, value: str):
+        with self._lock:
+            self._touch()
+            self._items[key] = value
+            self._items.move_to_end(key)
+            while len(self._items) > self.maxsize:
+                self._items.popitem(last=False)
+            self._schedule_expiry(self.idle_timeout)
+    
+    def discard(self, key: str):
+        with self._lock:
+            self._items.pop(key, None)
+    
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+_rotation_state: Dict = {}
+
+def _init_rotation_worker(old_key: Optional[bytes], new_key: bytes, index_key: bytes):
+    """Set up the Fernet instances once per worker process"""
+    from cryptography.fernet import Fernet
+    _rotation_state['old'] = Fernet(old_key) if old_key else None
+    _rotation_state['new'] = Fernet(new_key)
+    _rotation_state['index_key'] = index_key
+
+def _rotate_chunk(chunk: List[Tuple[str, Union[Dict[str, str], Tuple[str, str, str]]]]) -> List[Tuple[str, Dict[str, str]]]:
+    """Re-encrypt (source id, record) pairs, or encrypt (source id, plaintext entry) pairs"""
+    old, new, index_key = _rotation_state['old'], _rotation_state['new'], _rotation_state['index_key']
+    rotated = []
+    for source_id, item in chunk:
+        if isinstance(item, dict):
+            metadata = old.decrypt(item['meta'].encode())
+            password = old.decrypt(item['secret'].encode())
+            service = json.loads(metadata)['service']
+        else:
+            service, username, plain_password = item
+            metadata = json.dumps({'service': service, 'username': username}).encode()
+            password = plain_password.encode()
+        rotated.append((source_id, {
+            'id': hmac.new(index_key, service.lower().encode(), sha256).hexdigest(),
+            'meta': new.encrypt(metadata).decode(),
+            'secret': new.encrypt(password).decode()
+        }))
+    return rotated
+
 class PasswordManager:
-    """Main password manager class"""
-    def __init__(self, data_file: str = 'passwords.json'):
+    """Main password manager class
+    
+    The vault is a JSON Lines file: a header line, then one record per
+    entry. A record stores the entry's service/username and its password
+    as separate Fernet tokens under an id that is an HMAC of the normalized
+    service name, so lookups are dictionary hits and adding an entry only
+    encrypts and appends that record. Older single-blob vaults are still
+    read and are rewritten in this format on the next save. The header
+    holds the vault's KDF parameters and random salt; vaults without them
+    use EncryptionManager.LEGACY_KDF and are moved to a fresh salt by
+    upgrade_kdf() as soon as they are unlocked.
+    
+    With lazy=True nothing is decrypted at startup: metadata is decrypted
+    when an entry is looked up or services are listed, and passwords on
+    first access, through a bounded SecretCache. Added entries are kept
+    the same way. Since nothing is decrypted up front, the header carries
+    a check value derived from the key so a wrong master password is
+    refused at unlock.
+    """
+    VAULT_VERSION = 3
+    
+    def __init__(self, data_file: str = 'passwords.json', backups: int = 0,
+                 lazy: bool = False, cache_size: int = 32, idle_timeout: float = 60.0):
         self.data_file = data_file
-        self.entries: List[PasswordEntry] = []
+        self.backups = backups
+        self.lazy = lazy
+        self.secret_cache = SecretCache(cache_size, idle_timeout)
+        self.entries: Dict[str, PasswordEntry] = {}
         self.encryption_manager: Optional[EncryptionManager] = None
+        self._records: Dict[str, Dict[str, str]] = {}
+        self._stale_records = 0
+        self._needs_rewrite = False
+        self._index_key: Optional[bytes] = None
+        self.kdf: Optional[Dict] = None
     
     def initialize(self, master_password: str):
         """Initialize the manager with master password"""
-        self.encryption_manager = EncryptionManager(master_password)
         if os.path.exists(self.data_file):
+            with open(self.data_file, 'r') as f:
+                header = json.loads(f.readline())
+            self.kdf = header.get('kdf', EncryptionManager.LEGACY_KDF)
+        else:
+            header = None
+            self.kdf = EncryptionManager.new_kdf()
+        self._unlock(master_password)
+        if header is not None:
+            if not self._key_matches(header):
+                self.encryption_manager = None
+                self._index_key = None
+                raise ValueError("Master password does not match this vault")
+            # Vaults written before the check value get one on the next save
+            self._needs_rewrite = 'check' not in header
             self._load_entries()
+            if 'kdf' not in header:
+                # Vaults from before per-vault salts still use the fixed
+                # LEGACY_KDF salt; move them to a fresh one while the
+                # master password is at hand
+                self.upgrade_kdf(master_password)
+    
+    def _unlock(self, master_password: str):
+        self.encryption_manager = EncryptionManager(master_password, kdf=self.kdf)
+        self._index_key = hmac.new(self.encryption_manager.key, b'vault-index', sha256).digest()
+    
+    def _key_check(self) -> str:
+        return hmac.new(self._index_key, b'vault-check', sha256).hexdigest()
+    
+    def _key_matches(self, header: Dict) -> bool:
+        """Check the unlocked key against the vault before anything is read or written"""
+        if 'check' in header:
+            return hmac.compare_digest(header['check'], self._key_check())
+        
+        # Older vaults have no check value, so try to decrypt one token
+        token = header.get('data')
+        if token is None:
+            with open(self.data_file, 'r') as f:
+                f.readline()
+                try:
+                    token = json.loads(f.readline())['meta']
+                except json.JSONDecodeError:
+                    # No complete record to check against
+                    return True
+        from cryptography.fernet import InvalidToken
+        try:
+            self.encryption_manager.decrypt(token)
+        except InvalidToken:
+            return False
+        return True
+    
+    def upgrade_kdf(self, master_password: str, kdf: Optional[Dict] = None):
+        """Re-encrypt the vault in place under new KDF parameters
+        
+        master_password must be the current one. Every record is decrypted
+        and written again with a key derived from a fresh salt, and the new
+        parameters go into the vault header.
+        """
+        if EncryptionManager(master_password, kdf=self.kdf).key != self.encryption_manager.key:
+            raise ValueError("Master password does not match this vault")
+        entry_ids = dict.fromkeys([*self._records, *self.entries])
+        plaintext = [
+            (entry.service, entry.username, entry.password)
+            for entry in (self._entry_for(entry_id) for entry_id in entry_ids)
+        ]
+        
+        self.kdf = kdf or EncryptionManager.new_kdf()
+        self._unlock(master_password)
+        self.secret_cache.clear()
+        self._records = {}
+        self.entries = {
+            self._entry_id(service): PasswordEntry(service, username, password)
+            for service, username, password in plaintext
+        }
+        self._save_entries()
+        if self.lazy:
+            # Everything is in _records again; decrypt on demand as usual
+            self.entries = {}
+    
+    def _entry_id(self, service: str) -> str:
+        """Keyed hash of the normalized service name"""
+        return hmac.new(self._index_key, service.lower().encode(), sha256).hexdigest()
     
     def _load_entries(self):
-        """Load entries from file"""
-        with open(self.data_file, 'r') as f:
-            encrypted_data = json.load(f)
+        """Load entries from file
+        
+        A torn final record from an interrupted append is cut off the file,
+        so the next append starts on a fresh line. Any other unreadable line
+        is skipped without dropping the records after it.
+        """
+        with open(self.data_file, 'rb') as f:
+            data = f.read()
+        header_line, _, body = data.partition(b'\n')
+        header = json.loads(header_line)
+        if 'data' in header:
+            self._load_legacy_entries(header['data'])
+            return
+        
+        complete = body.rfind(b'\n') + 1
+        if complete < len(body):
+            os.truncate(self.data_file, len(header_line) + 1 + complete)
+        for line in body[:complete].splitlines():
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if record['id'] in self._records:
+                self._stale_records += 1
+            self._records[record['id']] = record
+        
+        if not self.lazy:
+            self.entries = {
+                entry_id: self._decrypt_record(record)
+                for entry_id, record in self._records.items()
+            }
+    
+    def _load_legacy_entries(self, encrypted_data: str):
+        """Load a vault stored as a single encrypted blob
         
-        decrypted_data = self.encryption_manager.decrypt(encrypted_data['data'])
-        self.entries = [PasswordEntry.from_dict(entry) for entry in json.loads(decrypted_data)]
+        Services are now matched ignoring case, so entries whose names
+        differ only in case would share an id. The first one keeps its name,
+        as the old linear lookup returned it; later ones are kept as
+        "name (2)", "name (3)" and so on, with a warning, so the rewrite
+        never drops a stored credential.
+        """
+        decrypted_data = self.encryption_manager.decrypt(encrypted_data)
+        for item in json.loads(decrypted_data):
+            entry = PasswordEntry.from_dict(item)
+            entry_id = self._entry_id(entry.service)
+            existing = self.entries.get(entry_id)
+            if existing is not None:
+                original = entry.service
+                suffix = 2
+                while self._entry_id(f"{original} ({suffix})") in self.entries:
+                    suffix += 1
+                entry.service = f"{original} ({suffix})"
+                entry_id = self._entry_id(entry.service)
+                import warnings
+                warnings.warn(f"Legacy entry '{original}' matches '{existing.service}' ignoring case; "
+                              f"kept as '{entry.service}'", stacklevel=2)
+            self.entries[entry_id] = entry
+        self._needs_rewrite = True
+    
+    def _encrypt_record(self, entry_id: str, entry: PasswordEntry) -> Dict[str, str]:
+        metadata = json.dumps({'service': entry.service, 'username': entry.username})
+        return {
+            'id': entry_id,
+            'meta': self.encryption_manager.encrypt(metadata),
+            'secret': self.encryption_manager.encrypt(entry.password)
+        }
+    
+    def _decrypt_record(self, record: Dict[str, str]) -> PasswordEntry:
+        metadata = json.loads(self.encryption_manager.decrypt(record['meta']))
+        if self.lazy:
+            return LazyPasswordEntry(metadata['service'], metadata['username'], record['id'], self)
+        password = self.encryption_manager.decrypt(record['secret'])
+        return PasswordEntry(metadata['service'], metadata['username'], password)
+    
+    def _password_for(self, entry_id: str) -> str:
+        """Decrypt a stored password, going through the secret cache"""
+        password = self.secret_cache.get(entry_id)
+        if password is None:
+            password = self.encryption_manager.decrypt(self._records[entry_id]['secret'])
+            self.secret_cache.put(entry_id, password)
+        return password
+    
+    def _entry_for(self, entry_id: str) -> Optional[PasswordEntry]:
+        """Return an entry, decrypting its metadata on first use in lazy mode"""
+        entry = self.entries.get(entry_id)
+        if entry is None and entry_id in self._records:
+            entry = self.entries[entry_id] = self._decrypt_record(self._records[entry_id])
+        return entry
     
     def _save_entries(self):
-        """Save entries to file"""
-        entries_data = [entry.to_dict() for entry in self.entries]
-        encrypted_data = self.encryption_manager.encrypt(json.dumps(entries_data))
+        """Rewrite the whole vault, dropping superseded records"""
+        for entry_id, entry in self.entries.items():
+            if entry_id not in self._records:
+                self._records[entry_id] = self._encrypt_record(entry_id, entry)
         
-        with open(self.data_file, 'w') as f:
-            json.dump({'data': encrypted_data}, f)
+        with atomic_write(self.data_file, self.backups) as f:
+            f.write(json.dumps({'version': self.VAULT_VERSION, 'kdf': self.kdf,
+                                'check': self._key_check()}) + '\n')
+            for record in self._records.values():
+                f.write(json.dumps(record) + '\n')
+        self._stale_records = 0
+        self._needs_rewrite = False
+    
+    def _append_record(self, record: Dict[str, str]):
+        """Append one record to the vault and flush it to disk"""
+        with open(self.data_file, 'a') as f:
+            f.write(json.dumps(record) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
     
     def add_entry(self, service: str, username: str, password: str):
-        """Add a new password entry"""
-        self.entries.append(PasswordEntry(service, username, password))
+        """Add a password entry, replacing any entry for the same service"""
+        entry_id = self._entry_id(service)
+        entry = PasswordEntry(service, username, password)
+        if entry_id in self._records:
+            self._stale_records += 1
+        self.secret_cache.discard(entry_id)
+        self._records[entry_id] = record = self._encrypt_record(entry_id, entry)
+        if self.lazy:
+            # Keep the plaintext out of entries; reads decrypt it through the cache
+            entry = LazyPasswordEntry(service, username, entry_id, self)
+        self.entries[entry_id] = entry
+        
+        # Compact once superseded records outnumber live ones
+        if (self._needs_rewrite or not os.path.exists(self.data_file)
+                or self._stale_records > len(self._records)):
+            self._save_entries()
+        else:
+            self._append_record(record)
+    
+    def rotate_master_password(self, old_password: str, new_password: str, kdf: Optional[Dict] = None,
+                               workers: Optional[int] = None, chunk_size: int = 256) -> Dict:
+        """Re-encrypt every entry under a new master password
+        
+        Records are sent in chunks to a process pool (inline when the vault
+        is small or workers=1) and the results are appended to a progress
+        file, data_file + '.rotate', which is fsynced after every chunk. The
+        vault itself is replaced atomically only once every entry is done.
+        If the rotation is interrupted, calling this again with the same
+        passwords skips the entries already in the progress file. Returns
+        entry counts, elapsed time and throughput.
+        """
+        if EncryptionManager(old_password, kdf=self.kdf).key != self.encryption_manager.key:
+            raise ValueError("Master password does not match this vault")
+        start = time.perf_counter()
+        
+        # Per-entry records are rotated as ciphertext; a legacy blob vault
+        # only has decrypted entries, which the workers encrypt
+        if self._records:
+            sources = list(self._records.items())
+        else:
+            sources = [(entry_id, (entry.service, entry.username, entry.password))
+                       for entry_id, entry in self.entries.items()]
+        
+        progress_file = self.data_file + '.rotate'
+        source = self._vault_fingerprint()
+        new_kdf, done = self._read_rotation_progress(progress_file, source, new_password)
+        new_kdf = new_kdf or kdf or EncryptionManager.new_kdf()
+        new_manager = EncryptionManager(new_password, kdf=new_kdf)
+        new_index_key = hmac.new(new_manager.key, b'vault-index', sha256).digest()
+        resumed = len(done)
+        pending = [item for item in sources if item[0] not in done]
+        
+        # Rewriting the progress file on resume also drops a torn last line
+        with atomic_write(progress_file) as f:
+            f.write(json.dumps({
+                'source': source,
+                'kdf': new_kdf,
+                'check': hmac.new(new_index_key, b'rotation', sha256).hexdigest()
+            }) + '\n')
+            for source_id, record in done.items():
+                f.write(json.dumps([source_id, record]) + '\n')
+        
+        chunks = [pending[i:i + chunk_size] for i in range(0, len(pending), chunk_size)]
+        init_args = (self.encryption_manager.key, new_manager.key, new_index_key)
+        with open(progress_file, 'a') as f:
+            if workers == 1 or len(chunks) <= 1:
+                _init_rotation_worker(*init_args)
+                results = map(_rotate_chunk, chunks)
+                self._write_rotation_chunks(f, results, done)
+            else:
+                from concurrent.futures import ProcessPoolExecutor
+                with ProcessPoolExecutor(workers, initializer=_init_rotation_worker,
+                                         initargs=init_args) as pool:
+                    self._write_rotation_chunks(f, pool.map(_rotate_chunk, chunks), done)
+        _rotation_state.clear()
+        
+        self.kdf = new_kdf
+        self._unlock(new_password)
+        self.secret_cache.clear()
+        self._records = {record['id']: record for record in done.values()}
+        self.entries = {}
         self._save_entries()
+        os.remove(progress_file)
+        if not self.lazy:
+            self.entries = {
+                entry_id: self._decrypt_record(record)
+                for entry_id, record in self._records.items()
+            }
+        
+        seconds = time.perf_counter() - start
+        return {
+            'entries': len(sources),
+            'resumed': resumed,
+            'seconds': seconds,
+            'entries_per_second': len(pending) / seconds if seconds else 0.0
+        }
+    
+    def _vault_fingerprint(self) -> str:
+        """Hash of the vault file, tying rotation progress to one vault state"""
+        digest = sha256()
+        if os.path.exists(self.data_file):
+            with open(self.data_file, 'rb') as f:
+                for block in iter(lambda: f.read(1 << 20), b''):
+                    digest.update(block)
+        return digest.hexdigest()
+    
+    def _read_rotation_progress(self, progress_file: str, source: str,
+                                new_password: str) -> Tuple[Optional[Dict], Dict[str, Dict[str, str]]]:
+        """Return the KDF and finished records of an interrupted rotation of this vault
+        
+        Progress left by a rotation of a different vault state, or towards
+        a different new password, is ignored.
+        """
+        if not os.path.exists(progress_file):
+            return None, {}
+        done: Dict[str, Dict[str, str]] = {}
+        with open(progress_file, 'r') as f:
+            try:
+                header = json.loads(f.readline())
+            except json.JSONDecodeError:
+                return None, {}
+            if header.get('source') != source:
+                return None, {}
+            key = EncryptionManager(new_password, kdf=header['kdf']).key
+            index_key = hmac.new(key, b'vault-index', sha256).digest()
+            if not hmac.compare_digest(header['check'], hmac.new(index_key, b'rotation', sha256).hexdigest()):
+                return None, {}
+            for line in f:
+                try:
+                    source_id, record = json.loads(line)
+                except json.JSONDecodeError:
+                    # A torn final line from an interrupted chunk
+                    break
+                done[source_id] = record
+        return header['kdf'], done
+    
+    @staticmethod
+    def _write_rotation_chunks(f, results, done: Dict[str, Dict[str, str]]):
+        for chunk in results:
+            for source_id, record in chunk:
+                f.write(json.dumps([source_id, record]) + '\n')
+                done[source_id] = record
+            f.flush()
+            os.fsync(f.fileno())
     
     def get_entry(self, service: str) -> Optional[PasswordEntry]:
         """Retrieve a password entry by service name"""
-        for entry in self.entries:
-            if entry.service.lower() == service.lower():
-                return entry
-        return None
+        return self._entry_for(self._entry_id(service))
     
     def list_services(self) -> List[str]:
         """List all stored services"""
-        return [entry.service for entry in self.entries]
+        if self.lazy:
+            # Legacy blob vaults only have decrypted entries until the rewrite
+            entry_ids = dict.fromkeys([*self._records, *self.entries])
+            return [self._entry_for(entry_id).service for entry_id in entry_ids]
+        return [entry.service for entry in self.entries.values()]
 
 class PasswordManagerCLI:
-    """Command Line Interface for the Password Manager"""
-    def __init__(self):
-        self.manager = PasswordManager()
+    """Command Line Interface for the Password Manager
+    
+    Without arguments it runs the interactive menu. Subcommands (add, get,
+    list, generate) run once and exit, and `batch [FILE]` runs one
+    subcommand per line from a file or stdin after a single unlock. The
+    master password is read from the PASSWORD_MANAGER_MASTER environment
+    variable when set, otherwise prompted for once.
+    """
+    MASTER_PASSWORD_ENV = 'PASSWORD_MANAGER_MASTER'
+    
+    def __init__(self, manager: Optional[PasswordManager] = None):
+        self.manager = manager or PasswordManager(lazy=True)
         self.password_generator = PasswordGenerator()
     
     def run(self):
@@ -129,8 +849,11 @@ class PasswordManagerCLI:
         print("=== Password Manager ===")
         
         # Initialize with master password
-        master_password = getpass.getpass("Enter master password: ")
-        self.manager.initialize(master_password)
+        try:
+            self.unlock()
+        except ValueError as e:
+            print(f"Cannot unlock vault: {e}")
+            return
         
         while True:
             print("\nOptions:")
@@ -138,7 +861,9 @@ class PasswordManagerCLI:
             print("2. Retrieve password")
             print("3. Generate strong password")
             print("4. List all services")
-            print("5. Exit")
+            print("5. Calibrate key derivation")
+            print("6. Change master password")
+            print("7. Exit")
             
             choice = input("Enter your choice: ")
             
@@ -151,6 +876,10 @@ class PasswordManagerCLI:
             elif choice == '4':
                 self._list_services()
             elif choice == '5':
+                self._calibrate_kdf()
+            elif choice == '6':
+                self._change_master_password()
+            elif choice == '7':
                 print("Goodbye!")
                 break
             else:
@@ -186,11 +915,66 @@ class PasswordManagerCLI:
         """Handle password generation"""
         length = int(input("Enter password length (default 16): ") or 16)
         use_symbols = input("Include symbols? (y/n): ").lower() == 'y'
+        exclude_ambiguous = input("Exclude ambiguous characters like 0/O and 1/l? (y/n): ").lower() == 'y'
+        minimum = int(input("Minimum characters from each class (default 1): ") or 1)
         
-        self.password_generator.length = length
-        password = self.password_generator.generate(use_symbols)
+        try:
+            policy = PasswordPolicy.from_options(use_symbols, minimum, exclude_ambiguous)
+            self.password_generator.length = length
+            password = self.password_generator.generate(policy=policy)
+        except ValueError as e:
+            print(f"Cannot generate password: {e}")
+            return
         print(f"\nGenerated password: {password}")
     
+    @staticmethod
+    def _describe_kdf(kdf: Dict) -> str:
+        params = ', '.join(f"{k}={v}" for k, v in kdf.items() if k not in ('name', 'salt'))
+        return f"{kdf['name']} ({params})"
+    
+    def _calibrate_kdf(self):
+        """Measure this machine and optionally re-encrypt the vault to match"""
+        name = input("Key derivation function (scrypt/pbkdf2, default scrypt): ").lower() or 'scrypt'
+        target_ms = float(input("Target unlock time in ms (default 250): ") or 250)
+        
+        try:
+            kdf = EncryptionManager.calibrate(name, target_ms / 1000)
+        except ValueError as e:
+            print(f"Cannot calibrate: {e}")
+            return
+        start = time.perf_counter()
+        EncryptionManager._derive_key('calibration', kdf)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        print(f"\nProposed: {self._describe_kdf(kdf)} ({elapsed_ms:.0f} ms on this machine)")
+        print(f"Current: {self._describe_kdf(self.manager.kdf)}")
+        
+        if input("Re-encrypt the vault with these settings? (y/n): ").lower() == 'y':
+            master_password = getpass.getpass("Confirm master password: ")
+            try:
+                self.manager.upgrade_kdf(master_password, kdf)
+            except ValueError as e:
+                print(f"Upgrade failed: {e}")
+                return
+            print("Vault upgraded successfully!")
+    
+    def _change_master_password(self):
+        """Re-encrypt the vault under a new master password"""
+        old_password = getpass.getpass("Current master password: ")
+        new_password = getpass.getpass("New master password: ")
+        if getpass.getpass("Confirm new master password: ") != new_password:
+            print("Passwords do not match.")
+            return
+        
+        try:
+            stats = self.manager.rotate_master_password(old_password, new_password)
+        except ValueError as e:
+            print(f"Cannot change master password: {e}")
+            return
+        print(f"Re-encrypted {stats['entries']} entries in {stats['seconds']:.2f}s "
+              f"({stats['entries_per_second']:.0f} entries/s)")
+        if stats['resumed']:
+            print(f"Resumed an interrupted change; {stats['resumed']} entries were already done.")
+    
     def _list_services(self):
         """List all stored services"""
         services = self.manager.list_services()
@@ -201,10 +985,115 @@ class PasswordManagerCLI:
         else:
             print("No services stored yet.")
 
-if __name__ == "__main__":
-    cli = PasswordManagerCLI()
-    cli.run()
-
-
-
+    @staticmethod
+    def build_parser() -> 'argparse.ArgumentParser':
+        import argparse
+        parser = argparse.ArgumentParser(prog='password_manager.py', description="Password manager")
+        parser.add_argument('--vault', default='passwords.json', help="vault file")
+        commands = parser.add_subparsers(dest='command')
+        
+        command = commands.add_parser('add', help="store a password, generating one if none is given")
+        command.add_argument('service')
+        command.add_argument('username')
+        command.add_argument('password', nargs='?')
+        command.add_argument('--length', type=int, default=16)
+        command.add_argument('--no-symbols', action='store_true')
+        
+        command = commands.add_parser('get', help="print the username and password for a service")
+        command.add_argument('service')
+        commands.add_parser('list', help="list stored services")
+        
+        command = commands.add_parser('generate', help="print generated passwords (no vault access)")
+        command.add_argument('--length', type=int, default=16)
+        command.add_argument('--count', type=int, default=1)
+        command.add_argument('--no-symbols', action='store_true')
+        command.add_argument('--exclude-ambiguous', action='store_true')
+        command.add_argument('--min', type=int, default=1, help="minimum characters from each class")
+        
+        command = commands.add_parser('batch', help="run one subcommand per line")
+        command.add_argument('file', nargs='?', default='-', help="command file, or - for stdin")
+        return parser
+    
+    def unlock(self):
+        """Unlock the vault from the environment or a single prompt"""
+        if self.manager.encryption_manager is None:
+            master_password = os.environ.get(self.MASTER_PASSWORD_ENV) or getpass.getpass("Enter master password: ")
+            self.manager.initialize(master_password)
+    
+    def run_command(self, args: 'argparse.Namespace'):
+        """Run one parsed subcommand, printing plain text results"""
+        if args.command == 'generate':
+            policy = PasswordPolicy.from_options(not args.no_symbols, args.min, args.exclude_ambiguous)
+            print('\n'.join(self.password_generator.generate_many(args.count, args.length, policy)))
+            return
+        
+        self.unlock()
+        if args.command == 'add':
+            password = args.password
+            if not password:
+                password = self.password_generator.generate_many(
+                    1, args.length, PasswordPolicy.from_options(not args.no_symbols))[0]
+                print(password)
+            self.manager.add_entry(args.service, args.username, password)
+        elif args.command == 'get':
+            entry = self.manager.get_entry(args.service)
+            if entry is None:
+                raise ValueError(f"No entry found for '{args.service}'")
+            print(f"{entry.username}\t{entry.password}")
+        elif args.command == 'list':
+            for service in self.manager.list_services():
+                print(service)
+        else:
+            raise ValueError(f"Unknown command '{args.command}'")
+    
+    def run_batch(self, lines, parser: 'argparse.ArgumentParser') -> int:
+        """Run one subcommand per line and return the number of failed lines"""
+        import shlex
+        failures = 0
+        for number, line in enumerate(lines, 1):
+            words = shlex.split(line, comments=True)
+            if not words:
+                continue
+            try:
+                args = parser.parse_args(words)
+                if args.command in (None, 'batch'):
+                    raise ValueError("expected a subcommand")
+                self.run_command(args)
+            except SystemExit:
+                # argparse has already printed the usage error
+                failures += 1
+                print(f"line {number}: invalid command", file=sys.stderr)
+            except Exception as e:
+                failures += 1
+                print(f"line {number}: {e}", file=sys.stderr)
+        return failures
+    
+    @classmethod
+    def main(cls, argv=None) -> int:
+        argv = sys.argv[1:] if argv is None else argv
+        if not argv:
+            # Plain interactive start; skip building the parser
+            cls().run()
+            return 0
+        
+        parser = cls.build_parser()
+        args = parser.parse_args(argv)
+        cli = cls(PasswordManager(args.vault, lazy=True))
+        if args.command is None:
+            cli.run()
+            return 0
+        
+        if args.command == 'batch':
+            if args.file == '-':
+                return 1 if cli.run_batch(sys.stdin, parser) else 0
+            with open(args.file, 'r') as f:
+                return 1 if cli.run_batch(f, parser) else 0
+        try:
+            cli.run_command(args)
+        except Exception as e:
+            print(f"error: {e}", file=sys.stderr)
+            return 1
+        return 0
 
+if __name__ == "__main__":
+    sys.exit(PasswordManagerCLI.main())
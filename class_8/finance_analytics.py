@@ -0,0 +1,95 @@
+import numpy as np
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence, Tuple
+from finance_tracker import FinanceManager, TransactionStore
+
+class LedgerAnalytics:
+    """Vectorized reports over a FinanceManager ledger
+    
+    The ledger is copied once into NumPy columns; every report after that
+    is a handful of array operations instead of a Python loop per row.
+    Requires numpy (`pip install numpy`).
+    """
+    def __init__(self, manager: FinanceManager):
+        if manager.storage.in_memory:
+            store = manager.transactions
+        else:
+            store = manager.storage.load_transactions()
+        self._load(store)
+    
+    def _load(self, store: TransactionStore):
+        self.categories: List[str] = list(store.categories)
+        self.is_expense = np.frombuffer(store.types, dtype=np.int8).astype(bool)
+        self.amounts = np.frombuffer(store.amounts, dtype=np.float64).copy()
+        self.timestamps = np.frombuffer(store.timestamps, dtype=np.float64).copy()
+        self.category_ids = np.frombuffer(store.category_ids, dtype=np.uint32).astype(np.intp)
+        
+        # Month boundaries are computed in local time by datetime, so a row
+        # finds its month with one searchsorted call
+        self.months: List[Tuple[int, int]] = []
+        boundaries = []
+        if len(self.timestamps):
+            first = datetime.fromtimestamp(self.timestamps.min())
+            last = datetime.fromtimestamp(self.timestamps.max())
+            year, month = first.year, first.month
+            while (year, month) <= (last.year, last.month):
+                self.months.append((year, month))
+                boundaries.append(datetime(year, month, 1).timestamp())
+                year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+        self.month_index = np.searchsorted(np.array(boundaries), self.timestamps, side="right") - 1
+    
+    def _mask(self, transaction_type: Optional[str]) -> np.ndarray:
+        if transaction_type == "income":
+            return ~self.is_expense
+        if transaction_type == "expense":
+            return self.is_expense
+        return np.ones(len(self.amounts), dtype=bool)
+    
+    def summary(self) -> Dict:
+        expenses = float(self.amounts[self.is_expense].sum())
+        income = float(self.amounts.sum()) - expenses
+        return {
+            "total_income": income,
+            "total_expenses": expenses,
+            "balance": income - expenses
+        }
+    
+    def category_totals(self, transaction_type: Optional[str] = "expense") -> Dict[str, float]:
+        """Total amount per category, largest first"""
+        mask = self._mask(transaction_type)
+        totals = np.bincount(self.category_ids[mask], weights=self.amounts[mask],
+                             minlength=len(self.categories))
+        order = np.argsort(totals)[::-1]
+        return {self.categories[i]: float(totals[i]) for i in order if totals[i]}
+    
+    def monthly_series(self) -> Dict:
+        """Income, expenses, balance and row count for every month in the ledger"""
+        months = len(self.months)
+        expenses = np.bincount(self.month_index, weights=self.amounts * self.is_expense,
+                               minlength=months)
+        income = np.bincount(self.month_index, weights=self.amounts * ~self.is_expense,
+                             minlength=months)
+        return {
+            "months": self.months,
+            "income": income,
+            "expenses": expenses,
+            "balance": income - expenses,
+            "transactions": np.bincount(self.month_index, minlength=months)
+        }
+    
+    def rolling_average(self, window: int = 3, series: str = "expenses") -> np.ndarray:
+        """Trailing mean of a monthly series; the first window-1 months are NaN"""
+        values = self.monthly_series()[series]
+        result = np.full(len(values), np.nan)
+        if window <= len(values):
+            cumulative = np.concatenate(([0.0], np.cumsum(values)))
+            result[window - 1:] = (cumulative[window:] - cumulative[:-window]) / window
+        return result
+    
+    def percentiles(self, q: Sequence[float] = (50, 90, 99),
+                    transaction_type: Optional[str] = "expense") -> Dict[float, float]:
+        """Percentiles of individual transaction amounts"""
+        amounts = self.amounts[self._mask(transaction_type)]
+        if not len(amounts):
+            return {p: 0.0 for p in q}
+        return dict(zip(q, (float(v) for v in np.percentile(amounts, q))))
@@ -0,0 +1,238 @@
+"""Benchmarks for finance_tracker.py
+
+Usage:
+    python finance_benchmark.py [--rows 1000 10000 100000] [--storage json|sqlite]
+                                [--memory] [--output results.json] [--compare baseline.json]
+
+Builds a reproducible synthetic ledger for every size in --rows (10**3 up to
+10**7; the JSON storage needs several GB of memory at the top end) and times
+the hot paths: bulk build, load_data, get_transactions with each filter,
+generate_monthly_report (computed, and again served from its cache),
+generate_range_report, get_summary, export_to_csv and single
+add_transaction calls. Each timing is the median of --repeat
+runs; with --memory every phase is run once more under tracemalloc to
+record its peak. File sizes are reported too.
+
+The JSON report can be saved with --output and checked against an earlier
+one with --compare, which adds current/baseline ratios per phase. The exit
+status is 1 if a phase taking at least --min-seconds is more than
+--threshold times slower than the baseline, if importing finance_tracker takes longer than --max-startup-ms,
+or if the import pulls in a module that should only load on first use.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Iterator, Optional, Tuple
+from finance_tracker import FIELDS, FinanceManager, SQLiteStorage, Transaction
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+# import_timing is shared with the other assignments in the repository root
+sys.path.append(os.path.dirname(HERE))
+from import_timing import measure_startup
+
+# Loaded on first use (colors, SQLite, CSV export, argv parsing), never at import
+DEFERRED_MODULES = ("colorama", "sqlite3", "csv", "gzip", "argparse", "shlex")
+
+CATEGORIES = [f"category{i:02d}" for i in range(20)]
+
+def synthetic_rows(count: int, seed: int = 42, span_days: int = 1461) -> Iterator[Tuple]:
+    """Reproducible ledger rows in FIELDS order, oldest first, ending now
+    
+    About 80% are expenses spread over 20 categories; dates are evenly
+    spaced over span_days with jitter, so every filter has work to do.
+    """
+    rng = random.Random(seed)
+    end = datetime.now().replace(microsecond=0)
+    start = end - timedelta(days=span_days)
+    step = span_days * 86400 / count
+    for i in range(count):
+        date = start + timedelta(seconds=int(i * step + rng.random() * step))
+        if rng.random() < 0.8:
+            row = ("expense", round(rng.lognormvariate(3, 1), 2), rng.choice(CATEGORIES))
+        else:
+            row = ("income", round(rng.uniform(500, 5000), 2), "salary")
+        yield row + (f"synthetic {i}", date.isoformat(" "))
+
+def measure(fn: Callable, repeat: int = 3, memory: bool = False) -> Dict:
+    """Median and minimum wall time of fn, plus its tracemalloc peak when memory is set"""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    result = {"seconds": statistics.median(samples), "min_seconds": min(samples)}
+    if memory:
+        tracemalloc.start()
+        fn()
+        result["peak_bytes"] = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return result
+
+def file_sizes(directory: str) -> Dict[str, int]:
+    return {name: os.path.getsize(os.path.join(directory, name)) for name in sorted(os.listdir(directory))}
+
+def benchmark_ledger(rows: int, directory: str, storage: str = "json", repeat: int = 3,
+                     memory: bool = False, adds: int = 20, seed: int = 42) -> Dict:
+    """Time the FinanceManager hot paths on a synthetic ledger of the given size"""
+    data_file = os.path.join(directory, "finance_data.json")
+    budget_file = os.path.join(directory, "budgets.json")
+    db_file = os.path.join(directory, "finance.db")
+    
+    def open_manager() -> FinanceManager:
+        if storage == "sqlite":
+            return FinanceManager(storage=SQLiteStorage(db_file))
+        return FinanceManager(data_file, budget_file)
+    
+    results = {}
+    manager = open_manager()
+    start = time.perf_counter()
+    manager.add_transactions(
+        Transaction.from_dict(dict(zip(FIELDS, row))) for row in synthetic_rows(rows, seed)
+    )
+    results["build"] = {"seconds": time.perf_counter() - start}
+    
+    def load():
+        fresh = open_manager()
+        fresh.load_data()
+        if storage == "sqlite":
+            fresh.storage.connection.close()
+    results["load_data"] = measure(load, repeat, memory)
+    
+    now = datetime.now()
+    month_start = (now - timedelta(days=365)).replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    month_end = (month_start + timedelta(days=32)).replace(day=1)
+    filters = {
+        "all": {},
+        "type": {"transaction_type": "expense"},
+        "category": {"category": CATEGORIES[0]},
+        "days": {"days": 30},
+        "date_range": {"start": month_start, "end": month_end},
+        "combined": {"transaction_type": "expense", "category": CATEGORIES[0], "days": 90}
+    }
+    for name, kwargs in filters.items():
+        # list() so lazily returned sequences are fully materialized
+        result = measure(lambda: list(manager.get_transactions(**kwargs)), repeat, memory)
+        result["matches"] = len(manager.get_transactions(**kwargs))
+        results[f"get_transactions[{name}]"] = result
+    
+    def monthly_report():
+        # Clear the report cache so every run measures the computation
+        manager.report_cache.clear()
+        manager.generate_monthly_report(month_start.year, month_start.month)
+    results["generate_monthly_report"] = measure(monthly_report, repeat, memory)
+    results["generate_monthly_report[cached]"] = measure(
+        lambda: manager.generate_monthly_report(month_start.year, month_start.month), repeat, memory)
+    results["generate_range_report"] = measure(
+        lambda: manager.generate_range_report(now - timedelta(days=365), now, "week"), repeat, memory)
+    results["get_summary"] = measure(manager.get_summary, repeat, memory)
+    results["export_to_csv"] = measure(
+        lambda: manager.export_to_csv(os.path.join(directory, "export.csv")), repeat, memory)
+    results["export_to_csv[gzip]"] = measure(
+        lambda: manager.export_to_csv(os.path.join(directory, "export.csv.gz")), repeat, memory)
+    
+    # Each call persists on its own, so this is the per-transaction latency
+    single_rows = list(synthetic_rows(adds, seed + 1))
+    start = time.perf_counter()
+    for row in single_rows:
+        manager.add_transaction(Transaction.from_dict(dict(zip(FIELDS, row))))
+    elapsed = time.perf_counter() - start
+    results["add_transaction"] = {"seconds": elapsed / max(adds, 1), "calls": adds}
+    
+    if storage == "sqlite":
+        manager.storage.connection.close()
+    return {"rows": rows, "phases": results, "file_sizes": file_sizes(directory)}
+
+def compare(report: Dict, baseline: Dict, threshold: float,
+            min_seconds: float = 0.001) -> Tuple[Dict, bool]:
+    """Per-phase current/baseline time ratios, and whether any exceeds threshold
+    
+    Phases under min_seconds in the current run are too noisy to judge and
+    never count as regressions.
+    """
+    comparison, regressed = {}, False
+    for size, current in report["ledgers"].items():
+        previous = baseline.get("ledgers", {}).get(size)
+        if not previous:
+            continue
+        phases = {}
+        for phase, result in current["phases"].items():
+            before = previous["phases"].get(phase)
+            if not before or not before["seconds"]:
+                continue
+            ratio = result["seconds"] / before["seconds"]
+            phases[phase] = {"baseline": before["seconds"], "current": result["seconds"], "ratio": ratio}
+            regressed = regressed or (ratio > threshold and result["seconds"] >= min_seconds)
+        comparison[size] = phases
+    return comparison, regressed
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=HERE, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def main():
+    parser = argparse.ArgumentParser(description="Finance tracker benchmarks")
+    parser.add_argument("--rows", type=int, nargs="+", default=[1000, 10000, 100000],
+                        help="ledger sizes to benchmark (10**3 to 10**7)")
+    parser.add_argument("--storage", choices=("json", "sqlite"), default="json")
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs per phase")
+    parser.add_argument("--adds", type=int, default=20, help="single add_transaction calls to time")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--memory", action="store_true", help="record tracemalloc peaks")
+    parser.add_argument("--output", help="also write the JSON report to this file")
+    parser.add_argument("--compare", help="earlier JSON report to compare against")
+    parser.add_argument("--threshold", type=float, default=1.25,
+                        help="fail when a phase is this many times slower than the baseline")
+    parser.add_argument("--min-seconds", type=float, default=0.001,
+                        help="ignore regressions in phases faster than this")
+    parser.add_argument("--max-startup-ms", type=float, default=60.0,
+                        help="fail if importing finance_tracker takes longer")
+    args = parser.parse_args()
+    
+    report = {
+        "meta": {
+            "revision": git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "storage": args.storage,
+            "seed": args.seed,
+            "repeat": args.repeat,
+            "date": datetime.now().isoformat(" ", "seconds")
+        },
+        "startup": measure_startup("finance_tracker", DEFERRED_MODULES, HERE),
+        "ledgers": {}
+    }
+    for rows in args.rows:
+        with tempfile.TemporaryDirectory() as directory:
+            report["ledgers"][str(rows)] = benchmark_ledger(
+                rows, directory, args.storage, args.repeat, args.memory, args.adds, args.seed)
+    
+    regressed = False
+    if args.compare:
+        with open(args.compare, "r") as f:
+            report["comparison"], regressed = compare(report, json.load(f), args.threshold,
+                                                         args.min_seconds)
+    
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    
+    startup = report["startup"]
+    if regressed or startup["median_ms"] > args.max_startup_ms or startup["deferred_modules_loaded"]:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
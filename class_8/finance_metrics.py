@@ -0,0 +1,219 @@
+import json
+import os
+import time
+from abc import ABC, abstractmethod
+from bisect import bisect_left
+from collections import deque
+from functools import wraps
+from typing import Callable, Dict, List, Optional, Sequence
+from finance_tracker import FinanceManager, atomic_write
+
+# Upper bounds in seconds, as in Prometheus client defaults
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+class Histogram:
+    """Latency histogram with fixed bucket upper bounds"""
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        # One slot per bound plus the +Inf overflow
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+    
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+    
+    def cumulative(self) -> List[int]:
+        """Counts of observations <= each bound, ending with the total"""
+        result, running = [], 0
+        for count in self.counts:
+            running += count
+            result.append(running)
+        return result
+    
+    def to_dict(self) -> Dict:
+        bounds = [str(bound) for bound in self.buckets] + ["+Inf"]
+        return {
+            "count": self.count,
+            "sum": self.sum,
+            "buckets": dict(zip(bounds, self.cumulative()))
+        }
+
+class MetricsSink(ABC):
+    """Destination for metric events"""
+    @abstractmethod
+    def record(self, event: Dict, metrics: "Metrics"):
+        """Called after every instrumented operation"""
+    
+    def flush(self, metrics: "Metrics"):
+        """Called by Metrics.flush(), e.g. at exit"""
+
+class MemorySink(MetricsSink):
+    """Keeps the most recent events in memory"""
+    def __init__(self, maxlen: int = 10000):
+        self.events = deque(maxlen=maxlen)
+    
+    def record(self, event: Dict, metrics: "Metrics"):
+        self.events.append(event)
+
+class JSONLogSink(MetricsSink):
+    """Appends one JSON line per event to a log file"""
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, "a", buffering=1)
+    
+    def record(self, event: Dict, metrics: "Metrics"):
+        self._file.write(json.dumps(event) + "\n")
+    
+    def flush(self, metrics: "Metrics"):
+        self._file.flush()
+    
+    def close(self):
+        self._file.close()
+
+class PrometheusSink(MetricsSink):
+    """Writes all metrics in the Prometheus text format to a file
+    
+    The file is replaced atomically, at most once per min_interval seconds
+    and on flush(), which suits the node_exporter textfile collector.
+    """
+    def __init__(self, path: str, min_interval: float = 5.0, prefix: str = "finance"):
+        self.path = path
+        self.min_interval = min_interval
+        self.prefix = prefix
+        self._last_write = 0.0
+    
+    def record(self, event: Dict, metrics: "Metrics"):
+        if time.monotonic() - self._last_write >= self.min_interval:
+            self.flush(metrics)
+    
+    def flush(self, metrics: "Metrics"):
+        with atomic_write(self.path) as f:
+            f.write(self.render(metrics))
+        self._last_write = time.monotonic()
+    
+    def render(self, metrics: "Metrics") -> str:
+        p = self.prefix
+        lines = [
+            f"# HELP {p}_operation_calls_total Instrumented FinanceManager calls.",
+            f"# TYPE {p}_operation_calls_total counter"
+        ]
+        lines.extend(f'{p}_operation_calls_total{{operation="{op}"}} {count}'
+                     for op, count in sorted(metrics.calls.items()))
+        lines += [
+            f"# HELP {p}_operation_errors_total Instrumented calls that raised.",
+            f"# TYPE {p}_operation_errors_total counter"
+        ]
+        lines.extend(f'{p}_operation_errors_total{{operation="{op}"}} {count}'
+                     for op, count in sorted(metrics.errors.items()))
+        lines += [
+            f"# HELP {p}_operation_seconds Latency of instrumented calls.",
+            f"# TYPE {p}_operation_seconds histogram"
+        ]
+        for op, histogram in sorted(metrics.latency.items()):
+            bounds = [repr(bound) for bound in histogram.buckets] + ["+Inf"]
+            for bound, count in zip(bounds, histogram.cumulative()):
+                lines.append(f'{p}_operation_seconds_bucket{{operation="{op}",le="{bound}"}} {count}')
+            lines.append(f'{p}_operation_seconds_sum{{operation="{op}"}} {histogram.sum}')
+            lines.append(f'{p}_operation_seconds_count{{operation="{op}"}} {histogram.count}')
+        lines += [
+            f"# HELP {p}_bytes_written_total Bytes written by instrumented calls.",
+            f"# TYPE {p}_bytes_written_total counter"
+        ]
+        lines.extend(f'{p}_bytes_written_total{{operation="{op}"}} {count}'
+                     for op, count in sorted(metrics.bytes_written.items()))
+        return "\n".join(lines) + "\n"
+
+class Metrics:
+    """Call counts, latency histograms and bytes written per operation, fanned out to sinks"""
+    def __init__(self, sinks: Sequence[MetricsSink] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.sinks = list(sinks)
+        self.buckets = tuple(buckets)
+        self.calls: Dict[str, int] = {}
+        self.errors: Dict[str, int] = {}
+        self.latency: Dict[str, Histogram] = {}
+        self.bytes_written: Dict[str, int] = {}
+    
+    def observe(self, operation: str, seconds: float, bytes_written: Optional[int] = None,
+                error: bool = False):
+        self.calls[operation] = self.calls.get(operation, 0) + 1
+        if error:
+            self.errors[operation] = self.errors.get(operation, 0) + 1
+        histogram = self.latency.get(operation)
+        if histogram is None:
+            histogram = self.latency[operation] = Histogram(self.buckets)
+        histogram.observe(seconds)
+        if bytes_written is not None:
+            self.bytes_written[operation] = self.bytes_written.get(operation, 0) + bytes_written
+        
+        if self.sinks:
+            event = {"time": time.time(), "operation": operation, "seconds": seconds,
+                     "bytes": bytes_written, "error": error}
+            for sink in self.sinks:
+                sink.record(event, self)
+    
+    def flush(self):
+        for sink in self.sinks:
+            sink.flush(self)
+    
+    def snapshot(self) -> Dict:
+        return {
+            operation: {
+                "calls": self.calls[operation],
+                "errors": self.errors.get(operation, 0),
+                "bytes_written": self.bytes_written.get(operation),
+                "latency": self.latency[operation].to_dict()
+            }
+            for operation in sorted(self.calls)
+        }
+
+def _file_size(path: Optional[str]) -> Optional[int]:
+    try:
+        return os.path.getsize(path) if path else None
+    except OSError:
+        return None
+
+# Operations that persist to the storage backend
+WRITES = frozenset(("save_data", "save_budgets", "add_transaction", "add_transactions",
+                    "import_from_csv", "flush"))
+
+def _bytes_written(manager: FinanceManager, operation: str, args: tuple, kwargs: dict,
+                   before: Optional[int]) -> Optional[int]:
+    """Bytes an operation wrote; None when it writes no file or the backend does not count them"""
+    if operation == "export_to_csv":
+        # Always a new file, so its size is exactly what was written
+        return _file_size(args[0] if args else kwargs.get("filename", "transactions_export.csv"))
+    if operation in WRITES and before is not None:
+        return manager.storage.bytes_written - before
+    return None
+
+def _timed(manager: FinanceManager, operation: str, method: Callable, metrics: Metrics) -> Callable:
+    @wraps(method)
+    def timed(*args, **kwargs):
+        before = manager.storage.bytes_written
+        start = time.perf_counter()
+        try:
+            result = method(*args, **kwargs)
+        except BaseException:
+            metrics.observe(operation, time.perf_counter() - start, error=True)
+            raise
+        seconds = time.perf_counter() - start
+        metrics.observe(operation, seconds, _bytes_written(manager, operation, args, kwargs, before))
+        return result
+    return timed
+
+def instrument(manager: FinanceManager, metrics: Metrics):
+    """Shadow the manager's instrumented methods with timed wrappers on the instance
+    
+    The class is left untouched, so other managers, and this one after
+    uninstrument(), run the plain methods with no overhead at all.
+    """
+    for name in FinanceManager.INSTRUMENTED:
+        method = getattr(type(manager), name).__get__(manager)
+        setattr(manager, name, _timed(manager, name.lstrip("_"), method, metrics))
+
+def uninstrument(manager: FinanceManager):
+    for operation in FinanceManager.INSTRUMENTED:
+        manager.__dict__.pop(operation, None)
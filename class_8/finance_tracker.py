@@ -1,22 +1,72 @@
 import json
-import csv
+import math
 import os
-import platform
+import sys
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
 from datetime import datetime, timedelta
+from itertools import islice
 from abc import ABC, abstractmethod
-from colorama import init, Fore, Back, Style
-from typing import List, Dict, Optional
+from contextlib import contextmanager
+from typing import List, Dict, Optional, Tuple, Iterable, Iterator, Sequence, TYPE_CHECKING
 
-# Initialize colorama
-init(autoreset=True)
+# atomic_files is shared with the other assignments in the repository root
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from atomic_files import atomic_write
+
+if TYPE_CHECKING:
+    import argparse
+
+class _LazyColorama:
+    """Stand-in for colorama's Fore, Back or Style that loads colorama on first use
+    
+    colorama is imported and init(autoreset=True) is called only when a
+    color is first needed, so subcommands and scripts never pay for it.
+    """
+    _initialized = False
+    
+    def __init__(self, name: str):
+        self._name = name
+    
+    def __getattr__(self, attr: str) -> str:
+        import colorama
+        if not _LazyColorama._initialized:
+            colorama.init(autoreset=True)
+            _LazyColorama._initialized = True
+        value = getattr(getattr(colorama, self._name), attr)
+        setattr(self, attr, value)
+        return value
+
+Fore = _LazyColorama("Fore")
+Back = _LazyColorama("Back")
+Style = _LazyColorama("Style")
+
+DATE_FORMAT = "%Y-%m-%d %H:%M:%S"
+FIELDS = ("type", "amount", "category", "description", "date")
+# Naive dates are stored as microseconds since this instant on the wall clock
+WALL_EPOCH = datetime(1970, 1, 1)
+MICROSECOND = timedelta(microseconds=1)
 
 class Transaction(ABC):
     """Base abstract class for all transactions"""
+    __slots__ = ("amount", "category", "description", "_date", "timestamp")
+    
     def __init__(self, amount: float, category: str, description: str = ""):
         self.amount = amount
         self.category = category
         self.description = description
-        self.date = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        self.date = datetime.now().strftime(DATE_FORMAT)
+    
+    @property
+    def date(self) -> str:
+        return self._date
+    
+    @date.setter
+    def date(self, value: str):
+        # Parse once here so date range queries can compare epoch timestamps
+        self._date = value
+        self.timestamp = datetime.fromisoformat(value).timestamp()
     
     @abstractmethod
     def get_type(self) -> str:
@@ -30,15 +80,145 @@ class Transaction(ABC):
             "description": self.description,
             "date": self.date
         }
+    
+    def to_row(self) -> Tuple:
+        """Values in FIELDS order, as used by CSV files and the storage backends"""
+        return (self.get_type(), self.amount, self.category, self.description, self.date)
+    
+    @staticmethod
+    def from_dict(data: Dict) -> "Transaction":
+        """Create an Income or Expense from a stored dictionary, keeping its date"""
+        transaction_class = Income if data["type"] == "income" else Expense
+        transaction = transaction_class(
+            amount=data["amount"],
+            category=data["category"],
+            description=data.get("description", "")
+        )
+        transaction.date = data.get("date", transaction.date)
+        return transaction
 
 class Income(Transaction):
+    __slots__ = ()
+    
     def get_type(self) -> str:
         return "income"
 
 class Expense(Transaction):
+    __slots__ = ()
+    
     def get_type(self) -> str:
         return "expense"
 
+class TransactionStore:
+    """Columnar in-memory ledger
+    
+    Amounts and timestamps live in typed arrays, transaction types in a
+    byte array and categories as ids into an interned list, each with its
+    case-folded key computed once when it is interned. Dates are kept
+    exactly as naive wall-clock times in wall_times; the epoch timestamps
+    are only used for ordering, since local times in a DST gap do not
+    survive a round trip through them. Rows are handed
+    out as Income/Expense views built on access, so the store can be used
+    wherever a list of transactions is expected. Row ids are positions and
+    never change.
+    """
+    TYPES = ("income", "expense")
+    
+    def __init__(self, transactions: Iterable[Transaction] = ()):
+        self.types = array("b")
+        self.amounts = array("d")
+        self.timestamps = array("d")
+        self.wall_times = array("q")
+        self.category_ids = array("I")
+        self.descriptions: List[str] = []
+        self.categories: List[str] = []
+        self.category_keys: List[str] = []
+        self._category_lookup: Dict[str, int] = {}
+        self._ids_by_key: Dict[str, set] = {}
+        for transaction in transactions:
+            self.append(transaction)
+    
+    def _category_id(self, category: str) -> int:
+        category_id = self._category_lookup.get(category)
+        if category_id is None:
+            category_id = self._category_lookup[category] = len(self.categories)
+            self.categories.append(category)
+            key = self.category_key(category)
+            self.category_keys.append(key)
+            self._ids_by_key.setdefault(key, set()).add(category_id)
+        return category_id
+    
+    def append(self, transaction: Transaction):
+        self.append_row(transaction.get_type(), transaction.amount, transaction.category,
+                        transaction.description, transaction.date)
+    
+    def append_row(self, transaction_type: str, amount: float, category: str,
+                   description: str, date: str):
+        date = datetime.fromisoformat(date)
+        self.types.append(0 if transaction_type == "income" else 1)
+        self.amounts.append(amount)
+        self.timestamps.append(date.timestamp())
+        self.wall_times.append((date - WALL_EPOCH) // MICROSECOND)
+        self.category_ids.append(self._category_id(category))
+        self.descriptions.append(description)
+    
+    def truncate(self, length: int):
+        """Drop every row from length on; interned categories are kept"""
+        for column in (self.types, self.amounts, self.timestamps, self.wall_times,
+                       self.category_ids, self.descriptions):
+            del column[length:]
+    
+    def append_dict(self, data: Dict):
+        """Add a row straight from a stored dictionary without building a Transaction"""
+        self.append_row(data["type"], data["amount"], data["category"],
+                        data.get("description", ""), data["date"])
+    
+    def date(self, row: int) -> datetime:
+        """The naive date of a row, exactly as it was added"""
+        return WALL_EPOCH + self.wall_times[row] * MICROSECOND
+    
+    def row(self, row: int) -> Tuple:
+        """Values of one row in FIELDS order without building a view"""
+        return (self.TYPES[self.types[row]], self.amounts[row],
+                self.categories[self.category_ids[row]], self.descriptions[row],
+                self.date(row).isoformat(" "))
+    
+    @classmethod
+    def type_code(cls, transaction_type: str) -> int:
+        """Value stored in types for transaction_type, or -1 if it is unknown"""
+        return cls.TYPES.index(transaction_type) if transaction_type in cls.TYPES else -1
+    
+    @staticmethod
+    def category_key(category: str) -> str:
+        """Normalized form under which categories compare equal, ignoring case"""
+        return category.lower()
+    
+    def category_ids_matching(self, category: str) -> set:
+        """Ids of all interned categories equal to category, ignoring case"""
+        return self._ids_by_key.get(self.category_key(category), set())
+    
+    def __len__(self) -> int:
+        return len(self.amounts)
+    
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._view(i) for i in range(len(self))[index]]
+        return self._view(range(len(self))[index])
+    
+    def __iter__(self) -> Iterator[Transaction]:
+        for i in range(len(self)):
+            yield self._view(i)
+    
+    def _view(self, row: int) -> Transaction:
+        transaction_class = Expense if self.types[row] else Income
+        transaction = transaction_class.__new__(transaction_class)
+        transaction.amount = self.amounts[row]
+        transaction.category = self.categories[self.category_ids[row]]
+        transaction.description = self.descriptions[row]
+        transaction.timestamp = self.timestamps[row]
+        transaction._date = self.date(row).isoformat(" ")
+        return transaction
+
 class Budget:
     """Class to handle budget categories"""
     def __init__(self, category: str, limit: float):
@@ -59,21 +239,739 @@ class Budget:
             "spent": self.spent
         }
 
+class LedgerAggregates:
+    """Running totals per transaction type, category and month
+    
+    Updated in O(1) for each new transaction so summaries never have to
+    walk the ledger. rebuild() recomputes everything from raw rows.
+    """
+    def __init__(self):
+        self.by_type: Dict[str, float] = {"income": 0.0, "expense": 0.0}
+        self.counts: Dict[str, int] = {"income": 0, "expense": 0}
+        self.by_category: Dict[Tuple[str, str], float] = {}
+        self.by_month: Dict[Tuple[int, int], Dict[str, float]] = {}
+    
+    def add(self, transaction: Transaction):
+        date = transaction.date
+        self.add_totals(transaction.get_type(), transaction.category,
+                        int(date[:4]), int(date[5:7]), transaction.amount)
+    
+    def add_totals(self, transaction_type: str, category: str, year: int, month: int,
+                   amount: float, count: int = 1):
+        """Fold in amount and count for one (type, category, month) group"""
+        self.by_type[transaction_type] = self.by_type.get(transaction_type, 0.0) + amount
+        self.counts[transaction_type] = self.counts.get(transaction_type, 0) + count
+        
+        key = (transaction_type, category)
+        self.by_category[key] = self.by_category.get(key, 0.0) + amount
+        
+        totals = self.by_month.get((year, month))
+        if totals is None:
+            totals = self.by_month[(year, month)] = {"income": 0.0, "expense": 0.0, "count": 0}
+        totals[transaction_type] += amount
+        totals["count"] += count
+    
+    def merge(self, other: "LedgerAggregates"):
+        """Fold in every total from other"""
+        for transaction_type, amount in other.by_type.items():
+            self.by_type[transaction_type] = self.by_type.get(transaction_type, 0.0) + amount
+            self.counts[transaction_type] = self.counts.get(transaction_type, 0) + other.counts[transaction_type]
+        for key, amount in other.by_category.items():
+            self.by_category[key] = self.by_category.get(key, 0.0) + amount
+        for month, other_totals in other.by_month.items():
+            totals = self.by_month.get(month)
+            if totals is None:
+                totals = self.by_month[month] = {"income": 0.0, "expense": 0.0, "count": 0}
+            for field, value in other_totals.items():
+                totals[field] += value
+    
+    @classmethod
+    def rebuild(cls, transactions: Iterable[Transaction]) -> "LedgerAggregates":
+        aggregates = cls()
+        if isinstance(transactions, TransactionStore):
+            # Read the columns directly instead of building a view per row
+            for transaction_type, amount, wall_time, category_id in zip(
+                    transactions.types, transactions.amounts,
+                    transactions.wall_times, transactions.category_ids):
+                date = WALL_EPOCH + wall_time * MICROSECOND
+                aggregates.add_totals(TransactionStore.TYPES[transaction_type],
+                                      transactions.categories[category_id],
+                                      date.year, date.month, amount)
+            return aggregates
+        
+        for transaction in transactions:
+            aggregates.add(transaction)
+        return aggregates
+    
+    def category_total(self, transaction_type: str, category: str) -> float:
+        return self.by_category.get((transaction_type, category), 0.0)
+    
+    def month_totals(self, year: int, month: int) -> Dict[str, float]:
+        return self.by_month.get((year, month), {"income": 0.0, "expense": 0.0, "count": 0})
+    
+    def matches(self, other: "LedgerAggregates", tolerance: float = 1e-6) -> bool:
+        """Compare with another set of aggregates, allowing for float rounding"""
+        def close(a: Dict, b: Dict) -> bool:
+            return a.keys() == b.keys() and all(abs(a[k] - b[k]) <= tolerance for k in a)
+        
+        return (close(self.by_type, other.by_type)
+                and self.counts == other.counts
+                and close(self.by_category, other.by_category)
+                and self.by_month.keys() == other.by_month.keys()
+                and all(close(self.by_month[k], other.by_month[k]) for k in self.by_month))
+
+class ReportCache:
+    """LRU of monthly reports keyed by (year, month), with an optional persisted tier
+    
+    Reports for closed months (ones that ended before they were computed)
+    are also written to persist_file, so they survive restarts. Adding a
+    transaction invalidates its month in both tiers. Category sets are
+    stored as sorted lists in the file. Since the file can outlive the
+    ledger it was written for, get() checks persisted reports against the
+    month's running totals and drops any that disagree.
+    """
+    def __init__(self, maxsize: int = 64, persist_file: Optional[str] = None):
+        self.maxsize = maxsize
+        self.persist_file = persist_file
+        self._items: "OrderedDict[Tuple[int, int], Dict]" = OrderedDict()
+        self._persisted: Optional[Dict[str, Dict]] = None
+    
+    @staticmethod
+    def _copy(report: Dict) -> Dict:
+        return dict(report, categories=set(report["categories"]))
+    
+    @staticmethod
+    def _file_key(key: Tuple[int, int]) -> str:
+        return f"{key[0]:04d}-{key[1]:02d}"
+    
+    def _persisted_reports(self) -> Dict[str, Dict]:
+        if self._persisted is None:
+            self._persisted = {}
+            if self.persist_file and os.path.exists(self.persist_file):
+                with open(self.persist_file, "r") as f:
+                    self._persisted = json.load(f)
+        return self._persisted
+    
+    def _save_persisted(self):
+        with atomic_write(self.persist_file) as f:
+            json.dump(self._persisted, f)
+    
+    @staticmethod
+    def _agrees(report: Dict, totals: Dict) -> bool:
+        """Whether report matches month totals from LedgerAggregates.month_totals"""
+        return (report["transactions"] == totals["count"]
+                and math.isclose(report["total_income"], totals["income"], rel_tol=1e-9, abs_tol=1e-6)
+                and math.isclose(report["total_expenses"], totals["expense"], rel_tol=1e-9, abs_tol=1e-6))
+    
+    def get(self, key: Tuple[int, int], totals: Optional[Dict] = None) -> Optional[Dict]:
+        """A copy of the cached report for key, or None
+        
+        With totals, a persisted report that does not match them is
+        discarded as stale.
+        """
+        report = self._items.get(key)
+        if report is None and self.persist_file:
+            stored = self._persisted_reports().get(self._file_key(key))
+            if stored is not None and totals is not None and not self._agrees(stored, totals):
+                self.invalidate([key])
+            elif stored is not None:
+                report = self._remember(key, dict(stored, categories=set(stored["categories"])))
+        elif report is not None:
+            self._items.move_to_end(key)
+        return None if report is None else self._copy(report)
+    
+    def _remember(self, key: Tuple[int, int], report: Dict) -> Dict:
+        self._items[key] = report
+        self._items.move_to_end(key)
+        while len(self._items) > self.maxsize:
+            self._items.popitem(last=False)
+        return report
+    
+    def put(self, key: Tuple[int, int], report: Dict, closed: bool = False):
+        self._remember(key, self._copy(report))
+        if closed and self.persist_file:
+            self._persisted_reports()[self._file_key(key)] = dict(
+                report, categories=sorted(report["categories"]))
+            self._save_persisted()
+    
+    def invalidate(self, keys: Iterable[Tuple[int, int]]):
+        """Drop the given months from both tiers"""
+        persisted_changed = False
+        for key in keys:
+            self._items.pop(key, None)
+            if self.persist_file and self._persisted_reports().pop(self._file_key(key), None) is not None:
+                persisted_changed = True
+        if persisted_changed:
+            self._save_persisted()
+    
+    def clear(self, persisted: bool = False):
+        self._items.clear()
+        if persisted and self.persist_file:
+            self._persisted = {}
+            self._save_persisted()
+
+class Storage(ABC):
+    """Base class for FinanceManager persistence backends
+    
+    Backends with in_memory = True hand the whole ledger to FinanceManager,
+    which keeps it in self.transactions. Other backends answer queries
+    themselves so the ledger never has to be loaded into memory.
+    bytes_written counts what the backend has written to its files, or is
+    None when it cannot tell.
+    """
+    in_memory = True
+    bytes_written: Optional[int] = None
+    
+    @abstractmethod
+    def load_transactions(self) -> List[Transaction]:
+        pass
+    
+    @abstractmethod
+    def save_transactions(self, transactions: List[Transaction]):
+        pass
+    
+    @abstractmethod
+    def append_rows(self, rows: Iterable[Tuple], transactions: List[Transaction]):
+        """Persist new rows (in FIELDS order) in one write
+        
+        For in-memory backends the rows have already been added to the end
+        of transactions.
+        """
+        pass
+    
+    @abstractmethod
+    def load_budgets(self) -> Dict[str, Budget]:
+        pass
+    
+    @abstractmethod
+    def save_budgets(self, budgets: Dict[str, Budget]):
+        pass
+
+class JSONStorage(Storage):
+    """Stores transactions and budgets in JSON files
+    
+    With journal=True new transactions are appended to a JSON Lines journal
+    next to the data file instead of rewriting the whole snapshot. The
+    journal is compacted into the snapshot every compact_threshold entries.
+    Files are replaced atomically; backups keeps that many older versions.
+    """
+    def __init__(self, data_file: str = "finance_data.json", budget_file: str = "budgets.json",
+                 journal: bool = False, journal_file: Optional[str] = None,
+                 compact_threshold: int = 1000, backups: int = 0):
+        self.data_file = data_file
+        self.budget_file = budget_file
+        self.backups = backups
+        self.journal = journal
+        self.journal_file = journal_file or f"{data_file}.journal"
+        self.compact_threshold = compact_threshold
+        self._journal_entries = 0
+        self._persisted_size = 0
+        self.bytes_written = 0
+    
+    def load_transactions(self) -> TransactionStore:
+        transactions = TransactionStore()
+        try:
+            with open(self.data_file, "r") as f:
+                data = json.load(f)
+                for item in data:
+                    transactions.append_dict(item)
+        except FileNotFoundError:
+            pass
+        
+        self._replay_journal(transactions)
+        self._persisted_size = len(transactions)
+        return transactions
+    
+    def save_transactions(self, transactions: List[Transaction]):
+        with atomic_write(self.data_file, self.backups) as f:
+            json.dump([t.to_dict() for t in transactions], f, indent=2)
+            self.bytes_written += f.tell()
+        self._persisted_size = len(transactions)
+        
+        # The journal header records the snapshot size, so a crash between
+        # the two writes never replays entries the snapshot already holds
+        if self.journal or os.path.exists(self.journal_file):
+            self._reset_journal(len(transactions))
+    
+    def append_rows(self, rows: Iterable[Tuple], transactions: List[Transaction]):
+        # Batches that would overflow the journal go straight to a new snapshot
+        pending = len(transactions) - self._persisted_size
+        if not self.journal or self._journal_entries + pending >= self.compact_threshold:
+            self.save_transactions(transactions)
+            return
+        
+        if not os.path.exists(self.journal_file):
+            self._reset_journal(self._persisted_size)
+        
+        with open(self.journal_file, "a") as f:
+            start = f.tell()
+            f.writelines(json.dumps(dict(zip(FIELDS, row))) + "\n" for row in rows)
+            self.bytes_written += f.tell() - start
+        
+        self._journal_entries += pending
+        self._persisted_size += pending
+    
+    def load_budgets(self) -> Dict[str, Budget]:
+        budgets = {}
+        try:
+            with open(self.budget_file, "r") as f:
+                data = json.load(f)
+                for item in data:
+                    budget = Budget(
+                        category=item["category"],
+                        limit=item["limit"]
+                    )
+                    budget.spent = item["spent"]
+                    budgets[item["category"]] = budget
+        except FileNotFoundError:
+            pass
+        return budgets
+    
+    def save_budgets(self, budgets: Dict[str, Budget]):
+        with atomic_write(self.budget_file, self.backups) as f:
+            json.dump([b.to_dict() for b in budgets.values()], f, indent=2)
+            self.bytes_written += f.tell()
+    
+    def _reset_journal(self, snapshot_size: int):
+        """Start an empty journal on top of a snapshot holding snapshot_size transactions"""
+        with atomic_write(self.journal_file) as f:
+            f.write(json.dumps({"snapshot_size": snapshot_size}) + "\n")
+            self.bytes_written += f.tell()
+        self._journal_entries = 0
+    
+    def _replay_journal(self, transactions: TransactionStore):
+        """Apply journal entries that are not yet part of the snapshot
+        
+        A torn final line from an interrupted append is cut off the file, so
+        the next append starts on a fresh line. Any other unreadable line is
+        skipped without dropping the entries after it.
+        """
+        try:
+            with open(self.journal_file, "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            return
+        
+        complete = data.rfind(b"\n") + 1
+        if complete < len(data):
+            os.truncate(self.journal_file, complete)
+        lines = data[:complete].splitlines()
+        if not lines:
+            return
+        
+        snapshot_size = json.loads(lines[0])["snapshot_size"]
+        already_in_snapshot = len(transactions) - snapshot_size
+        entries = 0
+        for line in lines[1:]:
+            try:
+                item = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            entries += 1
+            if entries > already_in_snapshot:
+                transactions.append_dict(item)
+        self._journal_entries = entries
+
+class SQLiteStorage(Storage):
+    """Stores transactions and budgets in a SQLite database
+    
+    Filters and reports run as SQL queries against indexes on date, type
+    and category, so FinanceManager does not keep the ledger in memory.
+    """
+    in_memory = False
+    COLUMNS = "type, amount, category, description, date"
+    
+    def __init__(self, db_file: str = "finance.db"):
+        self.db_file = db_file
+        import sqlite3
+        self.connection = sqlite3.connect(db_file)
+        self._create_schema()
+    
+    def _create_schema(self):
+        self.connection.executescript("""
+            CREATE TABLE IF NOT EXISTS transactions (
+                id INTEGER PRIMARY KEY,
+                type TEXT NOT NULL,
+                amount REAL NOT NULL,
+                category TEXT NOT NULL COLLATE NOCASE,
+                description TEXT NOT NULL DEFAULT '',
+                date TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_transactions_date ON transactions (date);
+            CREATE INDEX IF NOT EXISTS idx_transactions_type ON transactions (type, date);
+            CREATE INDEX IF NOT EXISTS idx_transactions_category ON transactions (category, date);
+            CREATE TABLE IF NOT EXISTS budgets (
+                category TEXT PRIMARY KEY,
+                "limit" REAL NOT NULL,
+                spent REAL NOT NULL DEFAULT 0
+            );
+        """)
+    
+    @classmethod
+    def from_json(cls, db_file: str = "finance.db", data_file: str = "finance_data.json",
+                  budget_file: str = "budgets.json") -> "SQLiteStorage":
+        """One-shot migration of the JSON data files (and any journal) into a new database"""
+        source = JSONStorage(data_file, budget_file)
+        storage = cls(db_file)
+        storage.save_transactions(source.load_transactions())
+        storage.save_budgets(source.load_budgets())
+        return storage
+    
+    @staticmethod
+    def _row_to_transaction(row) -> Transaction:
+        return Transaction.from_dict({
+            "type": row[0],
+            "amount": row[1],
+            "category": row[2],
+            "description": row[3],
+            "date": row[4]
+        })
+    
+    def load_transactions(self) -> TransactionStore:
+        transactions = TransactionStore()
+        for transaction_type, amount, category, description, date in self.connection.execute(
+                f"SELECT {self.COLUMNS} FROM transactions ORDER BY date, id"):
+            transactions.append_row(transaction_type, amount, category, description, date)
+        return transactions
+    
+    def save_transactions(self, transactions: List[Transaction]):
+        with self.connection:
+            self.connection.execute("DELETE FROM transactions")
+            self.connection.executemany(
+                f"INSERT INTO transactions ({self.COLUMNS}) VALUES (?, ?, ?, ?, ?)",
+                (t.to_row() for t in transactions)
+            )
+    
+    def append_rows(self, rows: Iterable[Tuple], transactions: List[Transaction]):
+        with self.connection:
+            self.connection.executemany(
+                f"INSERT INTO transactions ({self.COLUMNS}) VALUES (?, ?, ?, ?, ?)", rows
+            )
+    
+    def load_budgets(self) -> Dict[str, Budget]:
+        budgets = {}
+        for category, limit, spent in self.connection.execute('SELECT category, "limit", spent FROM budgets'):
+            budget = Budget(category, limit)
+            budget.spent = spent
+            budgets[category] = budget
+        return budgets
+    
+    def save_budgets(self, budgets: Dict[str, Budget]):
+        with self.connection:
+            self.connection.execute("DELETE FROM budgets")
+            self.connection.executemany(
+                'INSERT INTO budgets (category, "limit", spent) VALUES (?, ?, ?)',
+                ((b.category, b.limit, b.spent) for b in budgets.values())
+            )
+    
+    def query_transactions(self,
+                           transaction_type: Optional[str] = None,
+                           category: Optional[str] = None,
+                           start: Optional[str] = None,
+                           end: Optional[str] = None) -> List[Transaction]:
+        """Return transactions matching the filters and dated in [start, end), oldest first"""
+        return [self._row_to_transaction(row)
+                for row in self.iter_rows(transaction_type, category, start, end)]
+    
+    @staticmethod
+    def _where(transaction_type: Optional[str], category: Optional[str],
+               start: Optional[str], end: Optional[str]) -> Tuple[str, List]:
+        conditions, params = [], []
+        if transaction_type:
+            conditions.append("type = ?")
+            params.append(transaction_type)
+        if category:
+            conditions.append("category = ?")
+            params.append(category)
+        if start:
+            conditions.append("date >= ?")
+            params.append(start)
+        if end:
+            conditions.append("date < ?")
+            params.append(end)
+        
+        return (" WHERE " + " AND ".join(conditions) if conditions else ""), params
+    
+    def iter_rows(self,
+                  transaction_type: Optional[str] = None,
+                  category: Optional[str] = None,
+                  start: Optional[str] = None,
+                  end: Optional[str] = None,
+                  offset: int = 0) -> Iterator[Tuple]:
+        """Stream matching rows in FIELDS order straight from the cursor, skipping offset rows in SQL"""
+        where, params = self._where(transaction_type, category, start, end)
+        sql = f"SELECT {self.COLUMNS} FROM transactions{where} ORDER BY date, id"
+        if offset:
+            sql += " LIMIT -1 OFFSET ?"
+            params.append(offset)
+        return iter(self.connection.execute(sql, params))
+    
+    def count_rows(self,
+                   transaction_type: Optional[str] = None,
+                   category: Optional[str] = None,
+                   start: Optional[str] = None,
+                   end: Optional[str] = None) -> int:
+        where, params = self._where(transaction_type, category, start, end)
+        return self.connection.execute(f"SELECT COUNT(*) FROM transactions{where}", params).fetchone()[0]
+    
+    def monthly_report(self, start: str, end: str) -> Dict:
+        """Totals, row count and categories for transactions dated in [start, end)"""
+        income, expenses, count = self.connection.execute("""
+            SELECT COALESCE(SUM(CASE WHEN type = 'income' THEN amount END), 0),
+                   COALESCE(SUM(CASE WHEN type = 'expense' THEN amount END), 0),
+                   COUNT(*)
+            FROM transactions WHERE date >= ? AND date < ?
+        """, (start, end)).fetchone()
+        categories = {
+            row[0] for row in self.connection.execute(
+                "SELECT DISTINCT category FROM transactions WHERE date >= ? AND date < ?",
+                (start, end)
+            )
+        }
+        return {
+            "total_income": income,
+            "total_expenses": expenses,
+            "transactions": count,
+            "categories": categories
+        }
+    
+    def aggregates(self) -> LedgerAggregates:
+        """Build running aggregates with one GROUP BY instead of loading every row
+        
+        Categories are grouped with BINARY collation, overriding the
+        column's NOCASE, so the totals are keyed by exact category like the
+        ones FinanceManager keeps as rows are added.
+        """
+        aggregates = LedgerAggregates()
+        for transaction_type, category, year, month, amount, count in self.connection.execute("""
+                SELECT type, category, CAST(substr(date, 1, 4) AS INTEGER),
+                       CAST(substr(date, 6, 2) AS INTEGER), SUM(amount), COUNT(*)
+                FROM transactions GROUP BY type, category COLLATE BINARY, substr(date, 1, 7)"""):
+            aggregates.add_totals(transaction_type, category, year, month, amount, count)
+        return aggregates
+
 class FinanceManager:
-    """Core financial operations manager"""
-    def __init__(self, data_file: str = "finance_data.json", budget_file: str = "budgets.json"):
+    """Core financial operations manager
+    
+    Persistence goes through a Storage backend. The JSON files are used by
+    default; the journal and backups options are passed on to JSONStorage.
+    """
+    def __init__(self, data_file: str = "finance_data.json", budget_file: str = "budgets.json",
+                 journal: bool = False, journal_file: Optional[str] = None,
+                 compact_threshold: int = 1000, storage: Optional[Storage] = None,
+                 report_cache_size: int = 64, report_cache_file: Optional[str] = None,
+                 backups: int = 0):
         self.data_file = data_file
         self.budget_file = budget_file
-        self.transactions: List[Transaction] = []
-        self.budgets: Dict[str, Budget] = {}
-        self.load_data()
+        self.storage = storage or JSONStorage(data_file, budget_file, journal=journal,
+                                              journal_file=journal_file,
+                                              compact_threshold=compact_threshold,
+                                              backups=backups)
+        self.report_cache = ReportCache(report_cache_size, report_cache_file)
+        # transactions, budgets, aggregates and the date index (_by_date,
+        # row ids sorted by time, with their timestamps in the parallel
+        # _timestamps array for bisection) are set by load_data(), which
+        # runs on first access to any of them. _by_category holds the same
+        # pair of arrays per category key, so a category is a posting list
+        # that can be cut to a date range by bisection too
+        self._loaded = False
+        # Unit-of-work state while inside batch(): nothing is persisted
+        # until the outermost batch exits
+        self._batch_depth = 0
+        self._unsaved_from: Optional[int] = None
+        self._pending_rows: List[Tuple] = []
+        self._budgets_dirty = False
+        self.metrics = None
+    
+    _LAZY_ATTRIBUTES = frozenset(("transactions", "budgets", "aggregates", "_by_date", "_timestamps",
+                                  "_by_category"))
+    
+    def __getattr__(self, name: str):
+        # Only reached when normal lookup fails, i.e. before the first load
+        if name in self._LAZY_ATTRIBUTES and not self.__dict__.get("_loaded"):
+            self.load_data()
+            return getattr(self, name)
+        raise AttributeError(f"'{type(self).__name__}' object has no attribute '{name}'")
+    
+    # Methods wrapped by enable_metrics(); _flush is where added rows are
+    # persisted and is reported as "flush"
+    INSTRUMENTED = ("load_data", "save_data", "save_budgets", "add_transaction", "add_transactions",
+                    "import_from_csv", "_flush", "get_transactions", "generate_monthly_report",
+                    "export_to_csv")
+    
+    def enable_metrics(self, metrics=None):
+        """Record call counts, latency histograms and bytes written for INSTRUMENTED methods
+        
+        Takes a finance_metrics.Metrics (a fresh in-memory one by default)
+        and returns it. The wrappers live on this instance only, so a
+        manager without metrics runs the plain methods.
+        """
+        from finance_metrics import Metrics, instrument
+        self.metrics = metrics or Metrics()
+        instrument(self, self.metrics)
+        return self.metrics
+    
+    def disable_metrics(self):
+        if self.metrics is not None:
+            from finance_metrics import uninstrument
+            uninstrument(self)
+            self.metrics.flush()
+            self.metrics = None
     
     def add_transaction(self, transaction: Transaction):
-        self.transactions.append(transaction)
+        self._add_rows([transaction.to_row()])
+    
+    def add_transactions(self, transactions: Iterable[Transaction]) -> int:
+        """Add many transactions with a single persistence flush and return how many were added"""
+        return self._add_rows(t.to_row() for t in transactions)
+    
+    @contextmanager
+    def batch(self):
+        """Defer all persistence until the block exits, then flush once
         
-        if isinstance(transaction, Expense):
-            self.update_budget(transaction.category, transaction.amount)
+        Budget spending is applied in memory right away, so reads inside the
+        block see it, and the budgets are saved once at the flush.
+        If the block raises, nothing is written and the in-memory state is
+        reloaded from storage.
+        """
+        self._batch_depth += 1
+        try:
+            yield self
+        except BaseException:
+            self._batch_depth -= 1
+            if not self._batch_depth:
+                self._discard_pending()
+            raise
+        self._batch_depth -= 1
+        if not self._batch_depth:
+            self._flush()
+    
+    @staticmethod
+    def _insert_sorted(rows: array, timestamps: array, row: int, timestamp: float):
+        """Insert a row into a time-sorted index, appending in O(1) when it is the newest"""
+        if not timestamps or timestamp >= timestamps[-1]:
+            timestamps.append(timestamp)
+            rows.append(row)
+        else:
+            position = bisect_right(timestamps, timestamp)
+            timestamps.insert(position, timestamp)
+            rows.insert(position, row)
+    
+    def _category_index(self, row: int) -> Tuple[array, array]:
+        store = self.transactions
+        key = store.category_keys[store.category_ids[row]]
+        index = self._by_category.get(key)
+        if index is None:
+            index = self._by_category[key] = (array("I"), array("d"))
+        return index
+    
+    def _index_row(self, row: int, timestamp: float):
+        """Insert a row into the date index and its category's posting list"""
+        self._insert_sorted(self._by_date, self._timestamps, row, timestamp)
+        self._insert_sorted(*self._category_index(row), row, timestamp)
+    
+    def _rebuild_date_index(self):
+        store = self.transactions
+        timestamps = store.timestamps
+        self._by_date = array("I", sorted(range(len(timestamps)), key=timestamps.__getitem__))
+        self._timestamps = array("d", (timestamps[row] for row in self._by_date))
         
+        # Splitting the date order by category keeps every posting list sorted
+        postings = [array("I") for _ in store.categories]
+        category_ids = store.category_ids
+        for row in self._by_date:
+            postings[category_ids[row]].append(row)
+        self._by_category = {}
+        for category_id, rows in enumerate(postings):
+            key = store.category_keys[category_id]
+            if key in self._by_category:
+                # Another spelling of the same category, e.g. "Food" and "food"
+                rows = array("I", sorted(self._by_category[key][0] + rows, key=timestamps.__getitem__))
+            self._by_category[key] = (rows, array("d", (timestamps[row] for row in rows)))
+    
+    @staticmethod
+    def _positions_between(timestamps: Sequence[float], start: Optional[datetime],
+                           end: Optional[datetime]) -> range:
+        """Positions in a date-sorted index whose timestamps fall in [start, end)"""
+        low = 0 if start is None else bisect_left(timestamps, start.timestamp())
+        high = len(timestamps) if end is None else bisect_left(timestamps, end.timestamp())
+        return range(low, high)
+    
+    @classmethod
+    def _slice_between(cls, rows: Sequence[int], timestamps: Sequence[float],
+                       start: Optional[datetime], end: Optional[datetime]) -> Sequence[int]:
+        positions = cls._positions_between(timestamps, start, end)
+        return rows[positions.start:positions.stop]
+    
+    def _rows_between(self, start: Optional[datetime] = None,
+                      end: Optional[datetime] = None) -> Sequence[int]:
+        return self._slice_between(self._by_date, self._timestamps, start, end)
+    
+    def transactions_between(self, start: Optional[datetime] = None,
+                             end: Optional[datetime] = None) -> List[Transaction]:
+        """Return in-memory transactions dated in [start, end), oldest first"""
+        return [self.transactions[row] for row in self._rows_between(start, end)]
+    
+    def _matching_rows(self,
+                       transaction_type: Optional[str] = None,
+                       category: Optional[str] = None,
+                       start: Optional[datetime] = None,
+                       end: Optional[datetime] = None,
+                       by_date: bool = False) -> Sequence[int]:
+        """Row ids of in-memory transactions matching the filters, filtered on the columns
+        
+        Rows come in insertion order, or oldest first when a date bound is
+        given or by_date is set. A category filter starts from that
+        category's posting list cut to the date range, so the work is
+        proportional to the matches rather than the ledger.
+        """
+        store = self.transactions
+        if category:
+            index = self._by_category.get(store.category_key(category))
+            if index is None:
+                return []
+            rows = self._slice_between(*index, start, end)
+            if not (start or end or by_date):
+                rows = sorted(rows)
+        elif start or end or by_date:
+            rows = self._rows_between(start, end)
+        else:
+            rows = range(len(store))
+        
+        if transaction_type:
+            types = store.types
+            code = store.type_code(transaction_type)
+            rows = [row for row in rows if types[row] == code]
+        
+        return rows
+    
+    def _dated_index(self, category: Optional[str], start: Optional[datetime],
+                     end: Optional[datetime]) -> Tuple[Sequence[int], range]:
+        """The date-sorted index to scan for category and the positions in it within [start, end)
+        
+        Nothing is copied, so callers can stop early or start at an offset
+        without paying for the rows they skip.
+        """
+        if category:
+            index = self._by_category.get(self.transactions.category_key(category))
+            if index is None:
+                return (), range(0)
+            rows, timestamps = index
+        else:
+            rows, timestamps = self._by_date, self._timestamps
+        return rows, self._positions_between(timestamps, start, end)
+    
+    @staticmethod
+    def _date_bounds(days: Optional[int], start: Optional[datetime],
+                     end: Optional[datetime]) -> Tuple[Optional[datetime], Optional[datetime]]:
+        """Fold a days window into an explicit [start, end) range"""
+        if days:
+            cutoff_date = datetime.now() - timedelta(days=days)
+            start = max(start, cutoff_date) if start else cutoff_date
+        return start, end
+    
+    def compact(self):
+        """Rewrite the full snapshot, folding in any journal entries"""
         self.save_data()
     
     def update_budget(self, category: str, amount: float):
@@ -102,45 +1000,298 @@ class FinanceManager:
     def get_all_budgets(self) -> List[Dict]:
         return [budget.to_dict() for budget in self.budgets.values()]
     
-    def get_transactions(self, 
+    def get_transactions(self,
                        transaction_type: Optional[str] = None,
                        category: Optional[str] = None,
-                       days: Optional[int] = None) -> List[Transaction]:
+                       days: Optional[int] = None,
+                       start: Optional[datetime] = None,
+                       end: Optional[datetime] = None) -> List[Transaction]:
         
-        filtered = self.transactions
+        start, end = self._date_bounds(days, start, end)
         
-        if transaction_type:
-            filtered = [t for t in filtered if t.get_type() == transaction_type]
+        if not self.storage.in_memory:
+            return self.storage.query_transactions(
+                transaction_type, category,
+                start.strftime(DATE_FORMAT) if start else None,
+                end.strftime(DATE_FORMAT) if end else None
+            )
         
-        if category:
-            filtered = [t for t in filtered if t.category.lower() == category.lower()]
+        if not (transaction_type or category or start or end):
+            return self.transactions
         
-        if days:
-            cutoff_date = datetime.now() - timedelta(days=days)
-            filtered = [t for t in filtered if datetime.strptime(t.date, "%Y-%m-%d %H:%M:%S") >= cutoff_date]
+        store = self.transactions
+        return [store[row] for row in self._matching_rows(transaction_type, category, start, end)]
+    
+    def iter_transactions(self,
+                          transaction_type: Optional[str] = None,
+                          category: Optional[str] = None,
+                          days: Optional[int] = None,
+                          start: Optional[datetime] = None,
+                          end: Optional[datetime] = None,
+                          offset: int = 0) -> Iterator[Transaction]:
+        """Lazily yield matching transactions oldest first, starting at offset
+        
+        Only the rows actually consumed are turned into Transaction objects,
+        so islice() over this fetches a single page.
+        """
+        start, end = self._date_bounds(days, start, end)
         
-        return filtered
+        if not self.storage.in_memory:
+            rows = self.storage.iter_rows(
+                transaction_type, category,
+                start.strftime(DATE_FORMAT) if start else None,
+                end.strftime(DATE_FORMAT) if end else None,
+                offset
+            )
+            return map(self.storage._row_to_transaction, rows)
+        
+        store = self.transactions
+        rows, positions = self._dated_index(category, start, end)
+        if not transaction_type:
+            return (store[rows[i]] for i in positions[offset:])
+        
+        # Filter as the caller consumes, so a page costs offset + page size row checks
+        types, code = store.types, store.type_code(transaction_type)
+        matching = (row for row in map(rows.__getitem__, positions) if types[row] == code)
+        return map(store.__getitem__, islice(matching, offset, None))
+    
+    def count_transactions(self,
+                           transaction_type: Optional[str] = None,
+                           category: Optional[str] = None,
+                           days: Optional[int] = None,
+                           start: Optional[datetime] = None,
+                           end: Optional[datetime] = None) -> int:
+        """Number of transactions matching the same filters as get_transactions"""
+        start, end = self._date_bounds(days, start, end)
+        
+        if not self.storage.in_memory:
+            return self.storage.count_rows(
+                transaction_type, category,
+                start.strftime(DATE_FORMAT) if start else None,
+                end.strftime(DATE_FORMAT) if end else None
+            )
+        
+        if not (category or start or end):
+            if transaction_type:
+                return self.aggregates.counts.get(transaction_type, 0)
+            return len(self.transactions)
+        
+        rows, positions = self._dated_index(category, start, end)
+        if not transaction_type:
+            return len(positions)
+        types, code = self.transactions.types, self.transactions.type_code(transaction_type)
+        return sum(1 for i in positions if types[rows[i]] == code)
+    
+    def _iter_rows(self,
+                   transaction_type: Optional[str] = None,
+                   category: Optional[str] = None,
+                   days: Optional[int] = None,
+                   start: Optional[datetime] = None,
+                   end: Optional[datetime] = None) -> Iterator[Tuple]:
+        """Stream rows in FIELDS order matching the same filters as get_transactions"""
+        start, end = self._date_bounds(days, start, end)
+        
+        if not self.storage.in_memory:
+            return self.storage.iter_rows(
+                transaction_type, category,
+                start.strftime(DATE_FORMAT) if start else None,
+                end.strftime(DATE_FORMAT) if end else None
+            )
+        
+        store = self.transactions
+        return (store.row(row) for row in self._matching_rows(transaction_type, category, start, end))
+    
+    @staticmethod
+    def _open_csv(filename: str, mode: str, compress: Optional[bool] = None):
+        """Open a CSV file for text I/O, through gzip for .gz names or when compress is set"""
+        if compress or (compress is None and filename.endswith(".gz")):
+            import gzip
+            return gzip.open(filename, mode + "t", compresslevel=6, newline="")
+        return open(filename, mode, newline="", buffering=1024 * 1024)
     
-    def export_to_csv(self, filename: str = "transactions_export.csv"):
-        with open(filename, 'w', newline='') as csvfile:
-            fieldnames = ['type', 'amount', 'category', 'description', 'date']
-            writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
+    def export_to_csv(self, filename: str = "transactions_export.csv",
+                      transaction_type: Optional[str] = None,
+                      category: Optional[str] = None,
+                      days: Optional[int] = None,
+                      start: Optional[datetime] = None,
+                      end: Optional[datetime] = None,
+                      compress: Optional[bool] = None,
+                      batch_size: int = 10000) -> int:
+        """Stream matching transactions to CSV in batches and return the row count"""
+        import csv
+        rows = self._iter_rows(transaction_type, category, days, start, end)
+        exported = 0
+        with self._open_csv(filename, "w", compress) as csvfile:
+            writer = csv.writer(csvfile)
+            writer.writerow(FIELDS)
+            while True:
+                batch = list(islice(rows, batch_size))
+                if not batch:
+                    break
+                writer.writerows(batch)
+                exported += len(batch)
+        return exported
+    
+    def import_from_csv(self, filename: str, compress: Optional[bool] = None) -> int:
+        """Bulk load transactions from a CSV export with a single persistence flush
+        
+        Returns the number of imported rows.
+        """
+        import csv
+        with self._open_csv(filename, "r", compress) as csvfile:
+            reader = csv.DictReader(csvfile)
+            rows = (
+                (item["type"], item["amount"], item["category"],
+                 item.get("description") or "", item["date"])
+                for item in reader
+            )
+            return self._add_rows(rows)
+    
+    @staticmethod
+    def _normalize_row(row: Tuple) -> Tuple[Tuple, datetime]:
+        """Check one row in FIELDS order and return it with its parsed date
+        
+        The type is lower-cased, the amount converted to a float and the
+        date rewritten in the form TransactionStore.row gives back, so rows
+        read from CSV or typed by hand are stored and compared the same way.
+        """
+        transaction_type, amount, category, description, date = row
+        transaction_type = str(transaction_type).strip().lower()
+        if transaction_type not in TransactionStore.TYPES:
+            raise ValueError(f"Unknown transaction type '{row[0]}'")
+        amount = float(amount)
+        parsed = datetime.fromisoformat(date)
+        return (transaction_type, amount, category, description or "", parsed.isoformat(" ")), parsed
+    
+    def _add_rows(self, rows: Iterable[Tuple]) -> int:
+        """Add rows in FIELDS order, then persist them and any budget changes once
+        
+        Every row is validated before it is stored, and totals and budgets
+        are only updated once all rows went in, so a bad row leaves the
+        manager as it was. The error names the offending row, counting
+        from 1.
+        """
+        delta = LedgerAggregates()
+        spending: Dict[str, float] = {}
+        months = set()
+        added = 0
+        
+        def track(row: Tuple) -> Tuple:
+            nonlocal added
+            try:
+                row, date = self._normalize_row(row)
+            except (TypeError, ValueError) as e:
+                raise ValueError(f"Row {added + 1}: {e}") from e
+            transaction_type, amount, category, _, _ = row
+            months.add((date.year, date.month))
+            delta.add_totals(transaction_type, category, date.year, date.month, amount)
+            if transaction_type == "expense":
+                spending[category] = spending.get(category, 0.0) + amount
+            added += 1
+            return row
+        
+        if self.storage.in_memory:
+            store = self.transactions
+            first_row = len(store)
+            latest = self._timestamps[-1] if self._timestamps else float("-inf")
+            in_order = True
+            try:
+                for row in rows:
+                    store.append_row(*track(row))
+                    timestamp = store.timestamps[-1]
+                    in_order = in_order and timestamp >= latest
+                    latest = max(latest, timestamp)
+            except BaseException:
+                store.truncate(first_row)
+                raise
             
-            writer.writeheader()
-            for transaction in self.transactions:
-                writer.writerow(transaction.to_dict())
+            # Re-sorting once beats inserting many out-of-order rows one by one
+            if in_order:
+                self._by_date.extend(range(first_row, len(store)))
+                self._timestamps.extend(store.timestamps[first_row:])
+                for row in range(first_row, len(store)):
+                    postings, posting_times = self._category_index(row)
+                    postings.append(row)
+                    posting_times.append(store.timestamps[row])
+            elif added <= 64:
+                for row in range(first_row, len(store)):
+                    self._index_row(row, store.timestamps[row])
+            else:
+                self._rebuild_date_index()
+            
+            if added and self._unsaved_from is None:
+                self._unsaved_from = first_row
+        elif self._batch_depth:
+            self._pending_rows.extend([track(row) for row in rows])
+        else:
+            # append_rows writes in one transaction, so a bad row stores nothing
+            self.storage.append_rows((track(row) for row in rows), self.transactions)
+        
+        self.aggregates.merge(delta)
+        for category, amount in spending.items():
+            if category in self.budgets:
+                self.budgets[category].add_spending(amount)
+                self._budgets_dirty = True
+        self.report_cache.invalidate(months)
+        if not self._batch_depth:
+            self._flush()
+        return added
+    
+    def _flush(self):
+        """Persist rows and budgets changed since the last flush"""
+        if self._unsaved_from is not None:
+            store = self.transactions
+            self.storage.append_rows((store.row(row) for row in range(self._unsaved_from, len(store))), store)
+            self._unsaved_from = None
+        if self._pending_rows:
+            self.storage.append_rows(self._pending_rows, self.transactions)
+            self._pending_rows = []
+        
+        if self._budgets_dirty:
+            self._budgets_dirty = False
+            self.save_budgets()
+    
+    def _discard_pending(self):
+        """Drop unflushed batch work and reload the persisted state"""
+        self._unsaved_from = None
+        self._pending_rows = []
+        self._budgets_dirty = False
+        self.load_data()
     
     def generate_monthly_report(self, year: int, month: int) -> Dict:
+        """Totals and categories for one month, served from report_cache when possible"""
+        report = self.report_cache.get((year, month), self.aggregates.month_totals(year, month))
+        if report is None:
+            report = self._compute_monthly_report(year, month)
+            # Rows still pending in a batch are not in storage yet, so the report may be stale
+            if not self._pending_rows:
+                closed = (datetime(year + 1, 1, 1) if month == 12 else datetime(year, month + 1, 1)) <= datetime.now()
+                self.report_cache.put((year, month), report, closed)
+        return report
+    
+    def _compute_monthly_report(self, year: int, month: int) -> Dict:
         start_date = datetime(year, month, 1)
         if month == 12:
             end_date = datetime(year+1, 1, 1)
         else:
             end_date = datetime(year, month+1, 1)
         
-        monthly_transactions = [
-            t for t in self.transactions
-            if start_date <= datetime.strptime(t.date, "%Y-%m-%d %H:%M:%S") < end_date
-        ]
+        if not self.storage.in_memory:
+            report = self.storage.monthly_report(
+                start_date.strftime(DATE_FORMAT),
+                end_date.strftime(DATE_FORMAT)
+            )
+            return {
+                "year": year,
+                "month": month,
+                "total_income": report["total_income"],
+                "total_expenses": report["total_expenses"],
+                "balance": report["total_income"] - report["total_expenses"],
+                "transactions": report["transactions"],
+                "categories": report["categories"]
+            }
+        
+        monthly_transactions = self.transactions_between(start_date, end_date)
         
         income = sum(t.amount for t in monthly_transactions if isinstance(t, Income))
         expenses = sum(t.amount for t in monthly_transactions if isinstance(t, Expense))
@@ -158,14 +1309,104 @@ class FinanceManager:
             }
         }
     
+    GRANULARITIES = ("day", "week", "month", "quarter", "year")
+    
+    @staticmethod
+    def _bucket_start(date: datetime, granularity: str) -> datetime:
+        """Start of the day, week (Monday), month, quarter or year containing date"""
+        date = date.replace(hour=0, minute=0, second=0, microsecond=0)
+        if granularity == "day":
+            return date
+        if granularity == "week":
+            return date - timedelta(days=date.weekday())
+        if granularity == "quarter":
+            return date.replace(month=date.month - (date.month - 1) % 3, day=1)
+        return date.replace(month=1 if granularity == "year" else date.month, day=1)
+    
+    @staticmethod
+    def _next_bucket(date: datetime, granularity: str) -> datetime:
+        if granularity in ("day", "week"):
+            return date + timedelta(days=1 if granularity == "day" else 7)
+        month = date.month - 1 + {"month": 1, "quarter": 3, "year": 12}[granularity]
+        return date.replace(year=date.year + month // 12, month=month % 12 + 1)
+    
+    def generate_range_report(self, start: datetime, end: datetime,
+                              granularity: str = "month") -> Dict:
+        """Per-bucket totals for transactions dated in [start, end), in one pass
+        
+        Buckets are calendar periods of the given granularity (weeks start on
+        Monday) and empty ones are included. Each holds income, expenses,
+        balance, a row count, per-category income and expense, and the
+        balance accumulated since start.
+        """
+        if granularity not in self.GRANULARITIES:
+            raise ValueError(f"Unknown granularity '{granularity}'")
+        
+        buckets, ends = [], []
+        bucket_start = self._bucket_start(start, granularity)
+        while bucket_start < end:
+            bucket_end = self._next_bucket(bucket_start, granularity)
+            buckets.append({
+                "start": bucket_start.strftime(DATE_FORMAT),
+                "end": bucket_end.strftime(DATE_FORMAT),
+                "total_income": 0.0,
+                "total_expenses": 0.0,
+                "transactions": 0,
+                "categories": {}
+            })
+            ends.append(bucket_end)
+            bucket_start = bucket_end
+        
+        # Rows arrive oldest first, so each one only moves the bucket pointer
+        # forward; dates are compared as timestamps or ISO strings, never parsed
+        if self.storage.in_memory:
+            store = self.transactions
+            types, amounts, timestamps = store.types, store.amounts, store.timestamps
+            categories, category_ids = store.categories, store.category_ids
+            rows = ((store.TYPES[types[row]], amounts[row], categories[category_ids[row]], timestamps[row])
+                    for row in self._rows_between(start, end))
+            ends = [bucket_end.timestamp() for bucket_end in ends]
+        else:
+            rows = ((row[0], row[1], row[2], row[4]) for row in self.storage.iter_rows(
+                start=start.strftime(DATE_FORMAT), end=end.strftime(DATE_FORMAT)))
+            ends = [bucket_end.strftime(DATE_FORMAT) for bucket_end in ends]
+        
+        index = 0
+        for transaction_type, amount, category, date in rows:
+            while date >= ends[index]:
+                index += 1
+            bucket = buckets[index]
+            bucket["total_income" if transaction_type == "income" else "total_expenses"] += amount
+            bucket["transactions"] += 1
+            totals = bucket["categories"].get(category)
+            if totals is None:
+                totals = bucket["categories"][category] = {"income": 0.0, "expense": 0.0}
+            totals[transaction_type] += amount
+        
+        income = expenses = 0.0
+        for bucket in buckets:
+            bucket["balance"] = bucket["total_income"] - bucket["total_expenses"]
+            income += bucket["total_income"]
+            expenses += bucket["total_expenses"]
+            bucket["cumulative_balance"] = income - expenses
+        
+        return {
+            "start": start.strftime(DATE_FORMAT),
+            "end": end.strftime(DATE_FORMAT),
+            "granularity": granularity,
+            "total_income": income,
+            "total_expenses": expenses,
+            "balance": income - expenses,
+            "buckets": buckets
+        }
+    
     def get_balance(self) -> float:
-        total_income = sum(t.amount for t in self.transactions if isinstance(t, Income))
-        total_expense = sum(t.amount for t in self.transactions if isinstance(t, Expense))
-        return total_income - total_expense
+        summary = self.get_summary()
+        return summary["balance"]
     
     def get_summary(self) -> Dict:
-        income = sum(t.amount for t in self.transactions if isinstance(t, Income))
-        expenses = sum(t.amount for t in self.transactions if isinstance(t, Expense))
+        income = self.aggregates.by_type["income"]
+        expenses = self.aggregates.by_type["expense"]
         balance = income - expenses
         
         return {
@@ -175,85 +1416,103 @@ class FinanceManager:
         }
     
     def save_data(self):
-        with open(self.data_file, "w") as f:
-            json.dump([t.to_dict() for t in self.transactions], f, indent=2)
+        if self.storage.in_memory:
+            self.storage.save_transactions(self.transactions)
+            self._unsaved_from = None
     
     def save_budgets(self):
-        with open(self.budget_file, "w") as f:
-            json.dump([b.to_dict() for b in self.budgets.values()], f, indent=2)
+        self.storage.save_budgets(self.budgets)
     
     def load_data(self):
-        try:
-            with open(self.data_file, "r") as f:
-                data = json.load(f)
-                for item in data:
-                    if item["type"] == "income":
-                        self.transactions.append(Income(
-                            amount=item["amount"],
-                            category=item["category"],
-                            description=item["description"]
-                        ))
-                    else:
-                        self.transactions.append(Expense(
-                            amount=item["amount"],
-                            category=item["category"],
-                            description=item["description"]
-                        ))
-        except FileNotFoundError:
-            self.transactions = []
+        self._loaded = True
+        self.report_cache.clear()
+        if self.storage.in_memory:
+            transactions = self.storage.load_transactions()
+            if not isinstance(transactions, TransactionStore):
+                transactions = TransactionStore(transactions)
+            self.transactions = transactions
+            self._rebuild_date_index()
+        else:
+            self.transactions = TransactionStore()
+            self._by_date = array("I")
+            self._timestamps = array("d")
+            self._by_category = {}
+        self.aggregates = self._compute_aggregates()
+        self.budgets = self.storage.load_budgets()
+    
+    def _compute_aggregates(self) -> LedgerAggregates:
+        if self.storage.in_memory:
+            return LedgerAggregates.rebuild(self.transactions)
+        return self.storage.aggregates()
+    
+    def check_aggregates(self, repair: bool = True) -> bool:
+        """Verify the running aggregates against the raw ledger
         
-        try:
-            with open(self.budget_file, "r") as f:
-                data = json.load(f)
-                for item in data:
-                    budget = Budget(
-                        category=item["category"],
-                        limit=item["limit"]
-                    )
-                    budget.spent = item["spent"]
-                    self.budgets[item["category"]] = budget
-        except FileNotFoundError:
-            self.budgets = {}
+        Returns True when they agree. On a mismatch the aggregates are
+        replaced by the rebuilt ones unless repair is False.
+        """
+        rebuilt = self._compute_aggregates()
+        if self.aggregates.matches(rebuilt):
+            return True
+        if repair:
+            self.aggregates = rebuilt
+            self.report_cache.clear(persisted=True)
+        return False
 
 class FinanceCLI:
-    """Command Line Interface for the Finance Tracker"""
-    def __init__(self):
-        self.manager = FinanceManager()
-        self.theme = {
-            "header": Fore.CYAN + Style.BRIGHT,
-            "option": Fore.YELLOW,
-            "input": Fore.GREEN,
-            "success": Fore.GREEN + Style.BRIGHT,
-            "error": Fore.RED + Style.BRIGHT,
-            "warning": Fore.YELLOW + Style.BRIGHT,
-            "income": Fore.LIGHTGREEN_EX,
-            "expense": Fore.LIGHTRED_EX,
-            "summary": Fore.LIGHTBLUE_EX,
-            "transaction": Fore.LIGHTWHITE_EX,
-            "positive": Fore.LIGHTGREEN_EX,
-            "negative": Fore.LIGHTRED_EX,
-            "neutral": Fore.LIGHTWHITE_EX,
-            "budget_safe": Fore.GREEN,
-            "budget_warning": Fore.YELLOW,
-            "budget_danger": Fore.RED
-        }
+    """Command Line Interface for the Finance Tracker
+    
+    Without arguments it runs the interactive menus. Subcommands such as
+    `add-expense 12.50 food lunch` run once and exit, and `batch [FILE]`
+    runs one subcommand per line from a file or stdin inside a single
+    FinanceManager.batch(), so the ledger is saved once at the end.
+    """
+    def __init__(self, manager: Optional[FinanceManager] = None, batch: bool = False):
+        self.manager = manager or FinanceManager()
+        self.batch = batch
+        self.page_size = 20
+        self._theme: Optional[Dict[str, str]] = None
+    
+    @property
+    def theme(self) -> Dict[str, str]:
+        """Color codes, built on first use so scripted runs never load colorama"""
+        if self._theme is None:
+            self._theme = {
+                "header": Fore.CYAN + Style.BRIGHT,
+                "option": Fore.YELLOW,
+                "input": Fore.GREEN,
+                "success": Fore.GREEN + Style.BRIGHT,
+                "error": Fore.RED + Style.BRIGHT,
+                "warning": Fore.YELLOW + Style.BRIGHT,
+                "income": Fore.LIGHTGREEN_EX,
+                "expense": Fore.LIGHTRED_EX,
+                "summary": Fore.LIGHTBLUE_EX,
+                "transaction": Fore.LIGHTWHITE_EX,
+                "positive": Fore.LIGHTGREEN_EX,
+                "negative": Fore.LIGHTRED_EX,
+                "neutral": Fore.LIGHTWHITE_EX,
+                "budget_safe": Fore.GREEN,
+                "budget_warning": Fore.YELLOW,
+                "budget_danger": Fore.RED
+            }
+        return self._theme
     
     def clear_screen(self):
-        """Clear the console screen"""
-        if platform.system() == "Windows":
-            os.system('cls')
-        else:
-            os.system('clear')
+        """Clear the console screen with an ANSI escape (colorama translates it on Windows)"""
+        if not self.batch and sys.stdout.isatty():
+            print("\033[2J\033[H", end="")
     
     def press_enter_to_continue(self):
         """Wait for user to press Enter"""
-        input(f"\n{self.theme['input']}Press Enter to continue...{Style.RESET_ALL}")
+        if not self.batch:
+            input(f"\n{self.theme['input']}Press Enter to continue...{Style.RESET_ALL}")
+    
+    def format_header(self, text) -> str:
+        return f"\n{self.theme['header']}{'=' * 50}\n{text.center(50)}\n{'=' * 50}{Style.RESET_ALL}\n"
     
     def print_header(self, text):
         """Print a formatted header"""
-        print(f"\n{self.theme['header']}{'=' * 50}")
-        print(f"{text.center(50)}")
-        print(f"{'=' * 50}{Style.RESET_ALL}\n")
+        print(self.format_header(text))
     
     def run(self):
         while True:
@@ -335,25 +1594,79 @@ class FinanceCLI:
         self.press_enter_to_continue()
     
     def view_transactions(self, transaction_type: Optional[str] = None):
-        self.clear_screen()
         title = "Transaction History"
         if transaction_type:
             title = f"{transaction_type.capitalize()} Transactions"
-        self.print_header(title)
+        self.page_transactions(title, "No transactions found.", transaction_type=transaction_type)
+    
+    def format_transaction(self, idx: int, t: Transaction) -> str:
+        color = self.theme['income'] if isinstance(t, Income) else self.theme['expense']
+        line = f"{self.theme['transaction']}{idx}. [{color}{t.get_type().upper()}{Style.RESET_ALL}] {t.date} - {t.category}: {color}${t.amount:.2f}{Style.RESET_ALL}"
+        if t.description:
+            line += f"\n   {self.theme['transaction']}Description: {t.description}{Style.RESET_ALL}"
+        return line
+    
+    def page_transactions(self, title: str, empty_message: str,
+                          transaction_type: Optional[str] = None,
+                          category: Optional[str] = None,
+                          days: Optional[int] = None):
+        """Show matching transactions one page at a time, oldest first
         
-        transactions = self.manager.get_transactions(transaction_type=transaction_type)
-        if not transactions:
-            print(f"{self.theme['warning']}No transactions found.")
+        Each page fetches only its own rows through
+        FinanceManager.iter_transactions and is written to the terminal in
+        a single write. The total is counted once per session, and moving
+        to the next page carries on with the same iterator instead of
+        skipping over the earlier rows again. Enter or n moves forward, p back, g jumps to the
+        first transaction on or after a date, s changes the page size and
+        q returns to the menu.
+        """
+        manager = self.manager
+        filters = {"transaction_type": transaction_type, "category": category, "days": days}
+        total = manager.count_transactions(**filters)
+        if not total:
+            self.clear_screen()
+            self.print_header(title)
+            print(f"{self.theme['warning']}{empty_message}")
             self.press_enter_to_continue()
             return
         
-        for idx, t in enumerate(transactions, 1):
-            color = self.theme['income'] if isinstance(t, Income) else self.theme['expense']
-            print(f"{self.theme['transaction']}{idx}. [{color}{t.get_type().upper()}{Style.RESET_ALL}] {t.date} - {t.category}: {color}${t.amount:.2f}")
-            if t.description:
-                print(f"   {self.theme['transaction']}Description: {t.description}")
-        
-        self.press_enter_to_continue()
+        offset = 0
+        rows, rows_offset = None, None
+        while True:
+            if offset != rows_offset:
+                rows = manager.iter_transactions(**filters, offset=offset)
+            page = list(islice(rows, self.page_size))
+            rows_offset = offset + len(page)
+            lines = [self.format_header(title)]
+            lines.extend(self.format_transaction(offset + i, t) for i, t in enumerate(page, 1))
+            lines.append(f"\n{self.theme['summary']}Showing {offset + 1}-{offset + len(page)} of {total}"
+                         f" (page {offset // self.page_size + 1} of {-(-total // self.page_size)}){Style.RESET_ALL}")
+            self.clear_screen()
+            sys.stdout.write("\n".join(lines) + "\n")
+            sys.stdout.flush()
+            if self.batch:
+                return
+            
+            choice = input(f"{self.theme['input']}[Enter/n] next  [p] previous  [g] go to date  [s] page size  [q] back: {Style.RESET_ALL}").strip().lower()
+            if choice in ("", "n"):
+                if offset + self.page_size >= total:
+                    return
+                offset += self.page_size
+            elif choice == "p":
+                offset = max(0, offset - self.page_size)
+            elif choice == "g":
+                try:
+                    date = datetime.fromisoformat(input(f"{self.theme['input']}Date (YYYY-MM-DD): {Style.RESET_ALL}"))
+                except ValueError:
+                    continue
+                offset = min(manager.count_transactions(**filters, end=date), total - 1)
+            elif choice == "s":
+                try:
+                    self.page_size = max(1, int(input(f"{self.theme['input']}Page size: {Style.RESET_ALL}")))
+                except ValueError:
+                    continue
+            elif choice == "q":
+                return
     
     def view_summary(self):
         self.clear_screen()
@@ -518,22 +1831,8 @@ class FinanceCLI:
         self.press_enter_to_continue()
     
     def view_recent_transactions(self):
-        self.clear_screen()
-        self.print_header("Recent Transactions (Last 7 days)")
-        
-        recent = self.manager.get_transactions(days=7)
-        if not recent:
-            print(f"{self.theme['warning']}No transactions in the last 7 days.")
-            self.press_enter_to_continue()
-            return
-        
-        for idx, t in enumerate(recent, 1):
-            color = self.theme['income'] if isinstance(t, Income) else self.theme['expense']
-            print(f"{self.theme['transaction']}{idx}. [{color}{t.get_type().upper()}{Style.RESET_ALL}] {t.date} - {t.category}: {color}${t.amount:.2f}")
-            if t.description:
-                print(f"   {self.theme['transaction']}Description: {t.description}")
-        
-        self.press_enter_to_continue()
+        self.page_transactions("Recent Transactions (Last 7 days)",
+                               "No transactions in the last 7 days.", days=7)
     
     def export_data(self):
         self.clear_screen()
@@ -581,33 +1880,189 @@ class FinanceCLI:
         self.print_header("Filter by Category")
         
         category = input(f"{self.theme['input']}Enter category to filter: {Style.RESET_ALL}")
-        filtered = self.manager.get_transactions(category=category)
+        self.page_transactions(f"Transactions for Category: {category}",
+                               f"No transactions found for category '{category}'", category=category)
+
+    @staticmethod
+    def build_parser() -> "argparse.ArgumentParser":
+        import argparse
+        parser = argparse.ArgumentParser(prog="finance_tracker.py",
+                                         description="Personal finance tracker")
+        parser.add_argument("--data-file", default="finance_data.json")
+        parser.add_argument("--budget-file", default="budgets.json")
+        parser.add_argument("--journal", action="store_true",
+                            help="append new transactions to a journal instead of rewriting the data file")
+        parser.add_argument("--metrics-log", metavar="FILE",
+                            help="append a JSON line per instrumented operation to FILE")
+        parser.add_argument("--metrics-prom", metavar="FILE",
+                            help="write Prometheus text-format metrics to FILE")
+        parser.add_argument("--backups", type=int, default=0, metavar="N",
+                            help="keep N previous versions of each data file")
+        parser.add_argument("--report-cache", metavar="FILE",
+                            help="keep reports for closed months in FILE across runs")
+        commands = parser.add_subparsers(dest="command")
         
-        if not filtered:
-            print(f"\n{self.theme['warning']}No transactions found for category '{category}'")
-            self.press_enter_to_continue()
-            return
+        for name in ("add-income", "add-expense"):
+            command = commands.add_parser(name)
+            command.add_argument("amount", type=float)
+            command.add_argument("category")
+            command.add_argument("description", nargs="?", default="")
         
-        self.clear_screen()
-        self.print_header(f"Transactions for Category: {category}")
+        command = commands.add_parser("list", help="print matching transactions as tab-separated rows, oldest first")
+        command.add_argument("--type", choices=TransactionStore.TYPES)
+        command.add_argument("--category")
+        command.add_argument("--days", type=int)
+        command.add_argument("--offset", type=int, default=0)
+        command.add_argument("--limit", type=int)
         
-        for idx, t in enumerate(filtered, 1):
-            color = self.theme['income'] if isinstance(t, Income) else self.theme['expense']
-            print(f"{self.theme['transaction']}{idx}. [{color}{t.get_type().upper()}{Style.RESET_ALL}] {t.date} - {t.category}: {color}${t.amount:.2f}")
-            if t.description:
-                print(f"   {self.theme['transaction']}Description: {t.description}")
+        commands.add_parser("summary")
+        command = commands.add_parser("report")
+        command.add_argument("year", type=int)
+        command.add_argument("month", type=int)
+        command = commands.add_parser("rollup", help="totals per period between two dates")
+        command.add_argument("start", type=datetime.fromisoformat, help="YYYY-MM-DD, inclusive")
+        command.add_argument("end", type=datetime.fromisoformat, help="YYYY-MM-DD, exclusive")
+        command.add_argument("--by", choices=FinanceManager.GRANULARITIES, default="month")
         
-        self.press_enter_to_continue()
+        command = commands.add_parser("budget-add")
+        command.add_argument("category")
+        command.add_argument("limit", type=float)
+        command = commands.add_parser("budget-status")
+        command.add_argument("category")
+        commands.add_parser("budgets")
+        
+        command = commands.add_parser("export")
+        command.add_argument("filename")
+        command.add_argument("--type", choices=TransactionStore.TYPES)
+        command.add_argument("--category")
+        command.add_argument("--days", type=int)
+        command = commands.add_parser("import")
+        command.add_argument("filename")
+        
+        command = commands.add_parser("batch", help="run one subcommand per line")
+        command.add_argument("file", nargs="?", default="-", help="command file, or - for stdin")
+        return parser
+    
+    def run_command(self, args: "argparse.Namespace"):
+        """Run one parsed subcommand, printing plain text results"""
+        manager = self.manager
+        if args.command in ("add-income", "add-expense"):
+            cls = Income if args.command == "add-income" else Expense
+            manager.add_transaction(cls(args.amount, args.category, args.description))
+        elif args.command == "list":
+            transactions = manager.iter_transactions(args.type, args.category, args.days, offset=args.offset)
+            for t in islice(transactions, args.limit):
+                print("\t".join((t.date, t.get_type(), t.category, f"{t.amount:.2f}", t.description)))
+        elif args.command == "summary":
+            summary = manager.get_summary()
+            print(f"income\t{summary['total_income']:.2f}")
+            print(f"expenses\t{summary['total_expenses']:.2f}")
+            print(f"balance\t{summary['balance']:.2f}")
+        elif args.command == "report":
+            report = manager.generate_monthly_report(args.year, args.month)
+            print(f"income\t{report['total_income']:.2f}")
+            print(f"expenses\t{report['total_expenses']:.2f}")
+            print(f"balance\t{report['balance']:.2f}")
+            print(f"categories\t{','.join(sorted(report['categories']))}")
+        elif args.command == "rollup":
+            report = manager.generate_range_report(args.start, args.end, args.by)
+            for bucket in report["buckets"]:
+                print("\t".join((bucket["start"][:10], f"{bucket['total_income']:.2f}",
+                                 f"{bucket['total_expenses']:.2f}", f"{bucket['balance']:.2f}",
+                                 str(bucket["transactions"]), f"{bucket['cumulative_balance']:.2f}")))
+        elif args.command == "budget-add":
+            manager.add_budget(args.category, args.limit)
+        elif args.command == "budget-status":
+            status = manager.get_budget_status(args.category)
+            if not status:
+                raise ValueError(f"No budget found for category '{args.category}'")
+            print(f"{args.category}\t{status['limit']:.2f}\t{status['spent']:.2f}\t{status['percentage']:.1f}%")
+        elif args.command == "budgets":
+            for budget in manager.get_all_budgets():
+                print(f"{budget['category']}\t{budget['limit']:.2f}\t{budget['spent']:.2f}")
+        elif args.command == "export":
+            count = manager.export_to_csv(args.filename, args.type, args.category, args.days)
+            print(f"exported\t{count}")
+        elif args.command == "import":
+            print(f"imported\t{manager.import_from_csv(args.filename)}")
+        else:
+            raise ValueError(f"Unknown command '{args.command}'")
+    
+    def run_batch(self, lines: Iterable[str], parser: "argparse.ArgumentParser") -> int:
+        """Run one subcommand per line and return the number of failed lines
+        
+        Blank lines and lines starting with # are skipped. Failures are
+        reported on stderr with their line number and do not stop the batch.
+        """
+        import shlex
+        failures = 0
+        with self.manager.batch():
+            for number, line in enumerate(lines, 1):
+                words = shlex.split(line, comments=True)
+                if not words:
+                    continue
+                try:
+                    args = parser.parse_args(words)
+                    if args.command in (None, "batch"):
+                        raise ValueError("expected a subcommand")
+                    self.run_command(args)
+                except SystemExit:
+                    # argparse has already printed the usage error
+                    failures += 1
+                    print(f"line {number}: invalid command", file=sys.stderr)
+                except Exception as e:
+                    failures += 1
+                    print(f"line {number}: {e}", file=sys.stderr)
+        return failures
+    
+    @classmethod
+    def main(cls, argv: Optional[Sequence[str]] = None) -> int:
+        argv = sys.argv[1:] if argv is None else argv
+        if not argv:
+            # Plain interactive start; skip building the parser
+            cls().run()
+            return 0
+        
+        parser = cls.build_parser()
+        args = parser.parse_args(argv)
+        manager = FinanceManager(args.data_file, args.budget_file, journal=args.journal,
+                                 report_cache_file=args.report_cache, backups=args.backups)
+        if args.metrics_log or args.metrics_prom:
+            from finance_metrics import JSONLogSink, Metrics, PrometheusSink
+            sinks = []
+            if args.metrics_log:
+                sinks.append(JSONLogSink(args.metrics_log))
+            if args.metrics_prom:
+                sinks.append(PrometheusSink(args.metrics_prom))
+            manager.enable_metrics(Metrics(sinks))
+        try:
+            return cls(manager).dispatch(args, parser)
+        finally:
+            # Writes the final Prometheus snapshot
+            manager.disable_metrics()
+    
+    def dispatch(self, args: "argparse.Namespace", parser: "argparse.ArgumentParser") -> int:
+        if args.command is None:
+            self.run()
+            return 0
+        
+        self.batch = True
+        if args.command == "batch":
+            if args.file == "-":
+                return 1 if self.run_batch(sys.stdin, parser) else 0
+            with open(args.file, "r") as f:
+                return 1 if self.run_batch(f, parser) else 0
+        try:
+            self.run_command(args)
+        except Exception as e:
+            print(f"error: {e}", file=sys.stderr)
+            return 1
+        return 0
 
 if __name__ == "__main__":
     try:
-        cli = FinanceCLI()
-        cli.run()
+        sys.exit(FinanceCLI.main())
     except KeyboardInterrupt:
         print(f"\n{Fore.RED}Program terminated by user.{Style.RESET_ALL}")
     except Exception as e:
         print(f"\n{Fore.RED}A critical error occurred: {e}{Style.RESET_ALL}")
-
-
-
-        
\ No newline at end of file
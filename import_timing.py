@@ -0,0 +1,46 @@
+"""Startup cost of the assignment modules, shared by their benchmarks"""
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+from typing import Dict, Iterable
+
+def measure_startup(module: str, deferred: Iterable[str], directory: str, runs: int = 5) -> Dict:
+    """Median `python -X importtime` cost of importing module from directory in a fresh interpreter
+    
+    Bytecode is cached in a temporary pycache_prefix and warmed by one
+    untimed run, so the numbers do not include compiling the sources.
+    deferred_modules_loaded lists any of the deferred modules (or their
+    submodules) that the import pulled in.
+    """
+    with tempfile.TemporaryDirectory() as cache:
+        env = dict(os.environ)
+        env.pop("PYTHONDONTWRITEBYTECODE", None)
+        command = [sys.executable, "-X", f"pycache_prefix={cache}", "-X", "importtime",
+                   "-c", f"import {module}"]
+        subprocess.run(command, cwd=directory, env=env, capture_output=True, check=True)
+        
+        samples, imports = [], {}
+        for _ in range(runs):
+            result = subprocess.run(command, cwd=directory, env=env, capture_output=True,
+                                    text=True, check=True)
+            imports = {}
+            for line in result.stderr.splitlines():
+                fields = line.split("|")
+                if len(fields) == 3 and fields[1].strip().isdigit():
+                    imports[fields[2].strip()] = int(fields[1])
+            samples.append(imports[module] / 1000)
+    
+    slowest = sorted((name for name in imports if name != module), key=imports.get, reverse=True)
+    return {
+        "module": module,
+        "runs": runs,
+        "median_ms": statistics.median(samples),
+        "min_ms": min(samples),
+        "slowest_imports": {name: imports[name] / 1000 for name in slowest[:5]},
+        "deferred_modules_loaded": sorted(
+            name for name in imports
+            if any(name == d or name.startswith(d + ".") for d in deferred)
+        )
+    }